@@ -0,0 +1,158 @@
+"""mtime-validated cache for the call script and interviewer prompt files.
+
+Every turn used to re-read and re-parse ``call_script.json``, the per-agent
+``*_prompt.json`` overrides and the ``*_system_prompt.txt`` templates.
+``ConfigFiles`` keeps the parsed content in memory and re-stats a file at most
+once per ``check_interval_seconds``; when its (mtime, size, inode) changes the
+file is re-read on the next access, so edits still apply without a restart.
+
+``generation`` increases whenever any watched file changes. Callers fold it
+into their own memo keys (merged script config, rendered system prompts) so
+derived values are dropped together with the text they came from.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from string import Formatter
+from typing import Any, Callable
+
+_MISSING = object()
+
+
+class PromptTemplate:
+    """A ``str.format`` template parsed once.
+
+    Rendering keeps the old semantics: a template that does not parse, or that
+    references a field the caller did not supply, is returned verbatim.
+    """
+
+    __slots__ = ("text", "_segments", "_simple")
+
+    def __init__(self, text: str):
+        self.text = text
+        try:
+            self._segments = list(Formatter().parse(text))
+        except ValueError:
+            self._segments = None
+        # Plain ``{name}`` fields (no conversion / format spec / attribute access) can be joined directly.
+        self._simple = self._segments is not None and all(
+            field is None or (not spec and not conv and field.isidentifier())
+            for _lit, field, spec, conv in self._segments
+        )
+
+    def render(self, values: dict) -> str:
+        if self._segments is None:
+            return self.text
+        if not self._simple:
+            try:
+                return self.text.format(**values)
+            except Exception:
+                return self.text
+        parts: list[str] = []
+        for literal, field, _spec, _conv in self._segments:
+            parts.append(literal)
+            if field is not None:
+                value = values.get(field, _MISSING)
+                if value is _MISSING:
+                    return self.text
+                parts.append(str(value))
+        return "".join(parts)
+
+
+class ConfigFiles:
+    def __init__(self, check_interval_seconds: float = 2.0, memo_size: int = 256, log: Callable[[str], None] | None = None):
+        self.check_interval_seconds = max(0.0, float(check_interval_seconds))
+        self.memo_size = max(1, int(memo_size))
+        self._log = log or (lambda _msg: None)
+        self._lock = threading.Lock()
+        # path -> (signature, checked_at, parsed value)
+        self._files: dict[str, tuple[Any, float, Any]] = {}
+        self._memo: OrderedDict[tuple, Any] = OrderedDict()
+        self.generation = 0
+        self._metrics = {"hits": 0, "reloads": 0, "memo_hits": 0, "memo_misses": 0}
+
+    def json(self, path: Path) -> Any:
+        return self._get(path, "json", json.loads)
+
+    def template(self, path: Path) -> PromptTemplate | None:
+        return self._get(path, "template", lambda raw: PromptTemplate(raw) if raw.strip() else None)
+
+    def memo(self, key: tuple, build: Callable[[], Any]) -> Any:
+        """Cache ``build()`` under ``key`` until any watched file changes."""
+        full_key = (self.generation,) + key
+        with self._lock:
+            if full_key in self._memo:
+                self._memo.move_to_end(full_key)
+                self._metrics["memo_hits"] += 1
+                return self._memo[full_key]
+            self._metrics["memo_misses"] += 1
+        value = build()
+        with self._lock:
+            self._memo[full_key] = value
+            while len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+        return value
+
+    def invalidate(self, path: Path | None = None) -> None:
+        with self._lock:
+            if path is None:
+                self._files.clear()
+            else:
+                for k in [k for k in self._files if k.startswith(str(path) + "\0")]:
+                    self._files.pop(k, None)
+            self._bump()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._metrics, "files": len(self._files), "memo": len(self._memo), "generation": self.generation}
+
+    # -- internals --------------------------------------------------------------
+
+    def _get(self, path: Path, kind: str, parse: Callable[[str], Any]):
+        key = f"{path}\0{kind}"
+        now = time.monotonic()
+        with self._lock:
+            entry = self._files.get(key)
+            if entry is not None and now - entry[1] < self.check_interval_seconds:
+                self._metrics["hits"] += 1
+                return entry[2]
+        sig = self._signature(path)
+        with self._lock:
+            entry = self._files.get(key)
+            if entry is not None and entry[0] == sig:
+                self._files[key] = (sig, now, entry[2])
+                self._metrics["hits"] += 1
+                return entry[2]
+        value = None
+        if sig is not None:
+            try:
+                value = parse(Path(path).read_text(encoding="utf-8"))
+            except Exception as e:
+                self._log(f"CONFIG_FILE_LOAD_FAIL path={path} | {e}")
+        with self._lock:
+            had = key in self._files
+            self._files[key] = (sig, now, value)
+            self._metrics["reloads"] += 1
+            if had:
+                self._bump()
+        if had:
+            self._log(f"CONFIG_FILE_RELOADED path={path}")
+        return value
+
+    def _bump(self) -> None:
+        self.generation += 1
+        self._memo.clear()
+
+    @staticmethod
+    def _signature(path: Path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
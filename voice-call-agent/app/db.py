@@ -0,0 +1,561 @@
+"""PostgreSQL connection pooling for the voice agent.
+
+Webhook handlers touch the database several times per request. Opening a fresh
+connection for every touch pays a TCP + auth handshake each time, so
+connections are kept in a bounded, thread-safe pool and handed out through a
+thin proxy whose ``close()`` returns the connection instead of closing it.
+Callers keep the existing ``conn = _db_conn() ... conn.close()`` shape.
+
+Webhooks that touch many tables run inside a ``UnitOfWork``: every
+``_db_conn()`` in the request shares one connection and one transaction,
+fire-and-forget writes are buffered and sent as a single batch, and the whole
+request commits once. ``with conn:`` blocks become savepoints so one failing
+block does not poison the rest of the request, matching the old
+connection-per-block behaviour. Cursors opened outside any block get a
+savepoint of their own, so a failed best-effort statement only undoes itself.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Callable
+
+# psycopg2.extensions.TRANSACTION_STATUS_* values.
+_TX_IDLE = 0
+_TX_INERROR = 3
+
+_FREE_SAVEPOINT = "uow_free"
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection became available in time."""
+
+
+class PooledConnection:
+    """Proxy around a raw DB-API connection checked out from a pool."""
+
+    def __init__(self, pool: "ConnectionPool", raw, created_at: float):
+        self._pool = pool
+        self._raw = raw
+        self._created_at = created_at
+        self._released = False
+
+    @property
+    def raw(self):
+        return self._raw
+
+    def cursor(self, *args, **kwargs):
+        return self._raw.cursor(*args, **kwargs)
+
+    def commit(self) -> None:
+        self._raw.commit()
+
+    def rollback(self) -> None:
+        self._raw.rollback()
+
+    def __enter__(self):
+        self._raw.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return self._raw.__exit__(exc_type, exc, tb)
+
+    def close(self) -> None:
+        # Hand the connection back instead of closing it; double close is a no-op.
+        if self._released:
+            return
+        self._released = True
+        self._pool._release(self._raw, self._created_at)
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+
+class ConnectionPool:
+    """Bounded connection pool with health checks and max-lifetime recycling."""
+
+    def __init__(
+        self,
+        connect: Callable[[], object],
+        min_size: int = 1,
+        max_size: int = 10,
+        timeout_seconds: float = 5.0,
+        max_lifetime_seconds: float = 1800.0,
+        health_check_idle_seconds: float = 30.0,
+    ):
+        self._connect = connect
+        self.min_size = max(0, int(min_size))
+        self.max_size = max(1, int(max_size))
+        self.timeout_seconds = max(0.0, float(timeout_seconds))
+        self.max_lifetime_seconds = max(0.0, float(max_lifetime_seconds))
+        self.health_check_idle_seconds = max(0.0, float(health_check_idle_seconds))
+
+        self._cond = threading.Condition(threading.Lock())
+        # Idle entries are (raw_conn, created_at, last_used_at); newest on the right.
+        self._idle: deque[tuple[object, float, float]] = deque()
+        self._size = 0
+        self._closed = False
+        self._metrics = {
+            "acquired": 0,
+            "created": 0,
+            "recycled": 0,
+            "health_check_failures": 0,
+            "discarded": 0,
+            "timeouts": 0,
+            "waits": 0,
+            "wait_ms_total": 0.0,
+            "wait_ms_max": 0.0,
+            "uow_committed": 0,
+            "uow_failed": 0,
+            "uow_deferred_writes": 0,
+            "uow_batches": 0,
+            "uow_replayed_writes": 0,
+        }
+
+    def warm(self) -> int:
+        """Open connections up to ``min_size``. Returns how many were added."""
+        added = 0
+        while True:
+            with self._cond:
+                if self._closed or self._size >= min(self.min_size, self.max_size):
+                    return added
+                self._size += 1
+            try:
+                raw = self._connect()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            now = time.monotonic()
+            with self._cond:
+                self._metrics["created"] += 1
+                self._idle.append((raw, now, now))
+                self._cond.notify()
+            added += 1
+
+    def connection(self, timeout_seconds: float | None = None) -> PooledConnection:
+        """Check out a healthy connection, waiting up to the pool timeout."""
+        timeout = self.timeout_seconds if timeout_seconds is None else max(0.0, float(timeout_seconds))
+        started = time.monotonic()
+        deadline = started + timeout
+        waited = False
+
+        while True:
+            candidate = None
+            create = False
+            with self._cond:
+                if self._closed:
+                    raise PoolTimeout("connection pool is closed")
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._metrics["timeouts"] += 1
+                        self._record_wait(started, waited)
+                        raise PoolTimeout(f"no connection available within {timeout:.1f}s (max_size={self.max_size})")
+                    waited = True
+                    self._cond.wait(remaining)
+                    if self._closed:
+                        raise PoolTimeout("connection pool is closed")
+                if self._idle:
+                    candidate = self._idle.pop()
+                else:
+                    self._size += 1
+                    create = True
+
+            if create:
+                try:
+                    raw = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                now = time.monotonic()
+                with self._cond:
+                    self._metrics["created"] += 1
+                    self._metrics["acquired"] += 1
+                    self._record_wait(started, waited)
+                return PooledConnection(self, raw, now)
+
+            raw, created_at, last_used = candidate
+            now = time.monotonic()
+            if self._expired(created_at, now):
+                self._discard(raw, "recycled")
+                continue
+            if self.health_check_idle_seconds and now - last_used >= self.health_check_idle_seconds:
+                if not self._healthy(raw):
+                    self._discard(raw, "health_check_failures")
+                    continue
+            with self._cond:
+                self._metrics["acquired"] += 1
+                self._record_wait(started, waited)
+            return PooledConnection(self, raw, created_at)
+
+    def unit_of_work(
+        self,
+        checkout: Callable[[], object] | None = None,
+        log: Callable[[str], None] | None = None,
+    ) -> "UnitOfWork":
+        """Request-scoped transaction; use as ``with pool.unit_of_work(): ...``."""
+        return UnitOfWork(self, checkout=checkout, log=log)
+
+    def stats(self) -> dict:
+        with self._cond:
+            idle = len(self._idle)
+            out = {
+                "size": self._size,
+                "idle": idle,
+                "in_use": self._size - idle,
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                **self._metrics,
+            }
+        waits = out["waits"]
+        out["wait_ms_avg"] = round(out["wait_ms_total"] / waits, 2) if waits else 0.0
+        out["wait_ms_total"] = round(out["wait_ms_total"], 2)
+        out["wait_ms_max"] = round(out["wait_ms_max"], 2)
+        return out
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for raw, _, _ in idle:
+            self._close_raw(raw)
+
+    def _release(self, raw, created_at: float) -> None:
+        if getattr(raw, "closed", 0):
+            self._discard(raw, "discarded")
+            return
+        # Reads run outside ``with conn:`` leave a transaction open; never pool that.
+        try:
+            if self._in_transaction(raw):
+                raw.rollback()
+        except Exception:
+            self._discard(raw, "discarded")
+            return
+        now = time.monotonic()
+        if self._expired(created_at, now):
+            self._discard(raw, "recycled")
+            return
+        with self._cond:
+            if self._closed:
+                self._size -= 1
+                closing = True
+            else:
+                self._idle.append((raw, created_at, now))
+                closing = False
+            self._cond.notify()
+        if closing:
+            self._close_raw(raw)
+
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._cond:
+            self._metrics[name] += n
+
+    def _discard(self, raw, reason: str) -> None:
+        self._close_raw(raw)
+        with self._cond:
+            self._size -= 1
+            self._metrics[reason] += 1
+            self._cond.notify()
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return bool(self.max_lifetime_seconds) and now - created_at >= self.max_lifetime_seconds
+
+    def _record_wait(self, started: float, waited: bool) -> None:
+        # Caller holds the lock.
+        if not waited:
+            return
+        ms = (time.monotonic() - started) * 1000.0
+        self._metrics["waits"] += 1
+        self._metrics["wait_ms_total"] += ms
+        self._metrics["wait_ms_max"] = max(self._metrics["wait_ms_max"], ms)
+
+    @staticmethod
+    def _in_transaction(raw) -> bool:
+        status = getattr(raw, "get_transaction_status", None)
+        if status is None:
+            return True
+        return status() != _TX_IDLE
+
+    @staticmethod
+    def _healthy(raw) -> bool:
+        try:
+            with raw.cursor() as cur:
+                cur.execute("select 1")
+                cur.fetchone()
+            raw.rollback()
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _close_raw(raw) -> None:
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+
+_CURRENT_UOW: ContextVar["UnitOfWork | None"] = ContextVar("db_unit_of_work", default=None)
+
+
+def current_unit_of_work() -> "UnitOfWork | None":
+    return _CURRENT_UOW.get()
+
+
+def after_commit(fn: Callable[[], object]) -> None:
+    """Run ``fn`` once the current unit of work commits, or right away if none is active."""
+    uow = _CURRENT_UOW.get()
+    if uow is None:
+        fn()
+    else:
+        uow.after_commit(fn)
+
+
+class SharedConnection:
+    """Connection handed to every ``_db_conn()`` caller inside a unit of work.
+
+    ``close()`` and ``commit()`` are deferred to the unit of work; ``with conn:``
+    opens a savepoint instead of a transaction.
+    """
+
+    def __init__(self, uow: "UnitOfWork", pooled):
+        self._uow = uow
+        self._pooled = pooled
+
+    @property
+    def raw(self):
+        return getattr(self._pooled, "raw", self._pooled)
+
+    def cursor(self, *args, **kwargs):
+        self._uow._before_statement()
+        return self.raw.cursor(*args, **kwargs)
+
+    def commit(self) -> None:
+        pass
+
+    def rollback(self) -> None:
+        self._uow._rollback_innermost()
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        self._uow._push_block()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._uow._pop_block(failed=exc_type is not None)
+        return False
+
+    def __getattr__(self, name):
+        return getattr(self.raw, name)
+
+
+class UnitOfWork:
+    """One pooled connection, one transaction and one write batch per request."""
+
+    def __init__(self, pool: ConnectionPool, checkout: Callable[[], object] | None = None, log: Callable[[str], None] | None = None):
+        self._pool = pool
+        self._checkout = checkout or pool.connection
+        self._log = log or (lambda _msg: None)
+        self._pooled = None
+        self._shared: SharedConnection | None = None
+        self._checkout_failed = False
+        # Buffered writes: (sql, params, fail_tag).
+        self._pending: list[tuple[str, object, str]] = []
+        # Open ``with conn:`` blocks: [savepoint_name, established].
+        self._blocks: list[list] = []
+        # Savepoint taken before each cursor opened outside a block.
+        self._free_savepoint = False
+        self._seq = 0
+        self._hooks: list[Callable[[], object]] = []
+        self._token = None
+
+    def __enter__(self) -> "UnitOfWork":
+        self._token = _CURRENT_UOW.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.finish()
+        finally:
+            _CURRENT_UOW.reset(self._token)
+        return False
+
+    def connection(self) -> SharedConnection | None:
+        """Shared connection for this request, checked out on first use."""
+        if self._shared is not None:
+            return self._shared
+        if self._checkout_failed:
+            return None
+        pooled = self._checkout()
+        if pooled is None:
+            # Don't pay the checkout timeout again for every later call in this request.
+            self._checkout_failed = True
+            return None
+        self._pooled = pooled
+        self._shared = SharedConnection(self, pooled)
+        return self._shared
+
+    def defer(self, sql: str, params=None, fail_tag: str = "DB_WRITE_FAIL") -> None:
+        """Buffer a write whose result the caller does not need."""
+        self._pending.append((sql, params, fail_tag))
+        self._pool._count("uow_deferred_writes")
+
+    def after_commit(self, fn: Callable[[], object]) -> None:
+        self._hooks.append(fn)
+
+    def finish(self) -> None:
+        """Flush buffered writes, commit once, release the connection, run hooks."""
+        try:
+            if self._pending and self.connection() is None:
+                self._log(f"DB_UOW_DROPPED | {len(self._pending)} buffered writes, no connection")
+                self._pending = []
+            if self._shared is not None:
+                raw = self._shared.raw
+                try:
+                    self._recover(raw)
+                    self._flush(raw)
+                    raw.commit()
+                    self._pool._count("uow_committed")
+                except Exception as e:
+                    self._pool._count("uow_failed")
+                    self._log(f"DB_UOW_COMMIT_FAIL | {e}")
+                    try:
+                        raw.rollback()
+                    except Exception:
+                        pass
+        finally:
+            if self._pooled is not None:
+                self._pooled.close()
+            self._pooled = None
+            self._shared = None
+            hooks, self._hooks = self._hooks, []
+            for fn in hooks:
+                try:
+                    fn()
+                except Exception as e:
+                    self._log(f"DB_UOW_HOOK_FAIL | {e}")
+
+    # -- savepoint bookkeeping -------------------------------------------------
+
+    def _push_block(self) -> None:
+        self._seq += 1
+        self._blocks.append([f"uow_sp_{self._seq}", False])
+
+    def _pop_block(self, failed: bool) -> None:
+        name, established = self._blocks.pop()
+        if not established or self._shared is None:
+            return
+        raw = self._shared.raw
+        # A swallowed error inside the block still leaves the transaction aborted.
+        if failed or self._tx_status(raw) == _TX_INERROR:
+            self._exec(raw, f"rollback to savepoint {name}")
+
+    def _rollback_innermost(self) -> None:
+        if self._shared is None:
+            return
+        for name, established in reversed(self._blocks):
+            if established:
+                self._exec(self._shared.raw, f"rollback to savepoint {name}")
+                return
+        if self._free_savepoint:
+            self._exec(self._shared.raw, f"rollback to savepoint {_FREE_SAVEPOINT}")
+
+    def _before_statement(self) -> None:
+        raw = self._shared.raw
+        self._recover(raw)
+        trailing = None
+        if self._blocks and not self._blocks[-1][1]:
+            self._blocks[-1][1] = True
+            trailing = self._blocks[-1][0]
+        self._flush(raw, trailing_savepoint=trailing)
+        if not self._blocks:
+            # Keep the previous statement's work, then fence off the next one.
+            release = f"release savepoint {_FREE_SAVEPOINT};\n" if self._free_savepoint else ""
+            self._exec(raw, f"{release}savepoint {_FREE_SAVEPOINT}")
+            self._free_savepoint = True
+
+    def _recover(self, raw) -> None:
+        if self._tx_status(raw) != _TX_INERROR:
+            return
+        for name, established in reversed(self._blocks):
+            if established:
+                self._exec(raw, f"rollback to savepoint {name}")
+                return
+        if self._free_savepoint:
+            self._exec(raw, f"rollback to savepoint {_FREE_SAVEPOINT}")
+            return
+        self._log("DB_UOW_ABORTED | statement outside a savepoint failed; earlier writes in this request were rolled back")
+        raw.rollback()
+
+    # -- batching --------------------------------------------------------------
+
+    def _flush(self, raw, trailing_savepoint: str | None = None) -> None:
+        pending, self._pending = self._pending, []
+        if not pending:
+            if trailing_savepoint:
+                self._exec(raw, f"savepoint {trailing_savepoint}")
+            return
+
+        rendered = []
+        with raw.cursor() as cur:
+            mogrify = getattr(cur, "mogrify", None)
+            for sql, params, tag in pending:
+                if mogrify is None:
+                    rendered.append((sql, params, tag))
+                    continue
+                try:
+                    text = mogrify(sql, params)
+                    rendered.append((text.decode() if isinstance(text, bytes) else text, None, tag))
+                except Exception as e:
+                    self._log(f"{tag} | {e}")
+
+        if rendered and all(params is None for _, params, _ in rendered):
+            batch = ";\n".join(["savepoint uow_flush", *(sql for sql, _, _ in rendered)])
+            if trailing_savepoint:
+                batch += f";\nsavepoint {trailing_savepoint}"
+            self._pool._count("uow_batches")
+            try:
+                self._exec(raw, batch, quiet=False)
+                return
+            except Exception:
+                self._exec(raw, "rollback to savepoint uow_flush")
+
+        # Batch failed (or the driver cannot render SQL): replay one by one so a
+        # single bad write is logged and skipped like it was before batching.
+        for sql, params, tag in rendered:
+            self._pool._count("uow_replayed_writes")
+            try:
+                self._exec(raw, "savepoint uow_stmt", quiet=False)
+                with raw.cursor() as cur:
+                    cur.execute(sql, params)
+            except Exception as e:
+                self._log(f"{tag} | {e}")
+                self._exec(raw, "rollback to savepoint uow_stmt")
+        if trailing_savepoint:
+            self._exec(raw, f"savepoint {trailing_savepoint}")
+
+    def _exec(self, raw, sql: str, quiet: bool = True) -> None:
+        try:
+            with raw.cursor() as cur:
+                cur.execute(sql)
+        except Exception as e:
+            if not quiet:
+                raise
+            self._log(f"DB_UOW_SAVEPOINT_FAIL | {e}")
+
+    @staticmethod
+    def _tx_status(raw) -> int:
+        status = getattr(raw, "get_transaction_status", None)
+        return status() if status else _TX_IDLE
@@ -0,0 +1,140 @@
+"""Local intent classification for control turns.
+
+Consent, callback confirmation, "any questions?", end-of-call and voicemail
+detection used to be scattered substring checks (``"no" in text`` also
+matches "know", "stop" ends the interview when a candidate says "we had to
+stop the rollout"). ``classify`` runs a fixed set of precompiled,
+word-boundary patterns and returns one label with a confidence, so the
+call flow can answer these turns without an LLM round-trip and only fall
+through to the model when the utterance is genuinely open-ended.
+
+Labels: ``yes``, ``no``, ``end_call``, ``question``, ``voicemail``,
+``unknown``. A bare DTMF digit maps to yes (1) / no (2) with confidence 1.0.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+
+YES = "yes"
+NO = "no"
+END_CALL = "end_call"
+QUESTION = "question"
+VOICEMAIL = "voicemail"
+UNKNOWN = "unknown"
+
+DEFAULT_THRESHOLD = 0.6
+
+# Labels that cannot both be meant by one utterance; a hit on both lowers confidence.
+_EXCLUSIVE = {frozenset((YES, NO))}
+
+
+@dataclass(frozen=True)
+class Intent:
+    label: str
+    confidence: float
+    scores: dict = field(default_factory=dict)
+
+    def is_(self, *labels: str, threshold: float = DEFAULT_THRESHOLD) -> bool:
+        return self.label in labels and self.confidence >= threshold
+
+    def score(self, label: str) -> float:
+        return self.scores.get(label, 0.0)
+
+
+def _rx(*phrases: str) -> re.Pattern:
+    return re.compile(r"\b(?:" + "|".join(phrases) + r")\b")
+
+
+# (label, weight, pattern, short_only): short_only patterns count only in utterances of <= 4 words.
+_RULES: list[tuple[str, float, re.Pattern, bool]] = [
+    (YES, 0.9, _rx(r"yes", r"yeah", r"yep", r"yup", r"ya", r"absolutely", r"definitely", r"of course", r"go ahead",
+                   r"(?<!not )(?<!n't )sure", r"(?<!not )ok(?:ay)?", r"no problem", r"no worries", r"sounds good"), False),
+    (YES, 0.7, _rx(r"(?<!not )(?<!n't )right(?! now)(?! away)", r"(?<!not )correct", r"i do(?! not)", r"that one", r"fine",
+                   r"let's do it", r"i have time", r"i can talk", r"uh huh", r"mm hmm"), False),
+    (NO, 0.9, _rx(r"no(?! problem)(?! worries)(?! (?:idea|doubt)\b)", r"nope", r"nah", r"not now", r"not right now",
+                  r"not a good time", r"none", r"no more"), False),
+    (NO, 0.7, _rx(r"busy", r"later", r"another time", r"call me back", r"wrong", r"different", r"that's all", r"that is all",
+                  r"not really", r"i'm good", r"i am good", r"not correct", r"not right", r"nothing else"), False),
+    (NO, 0.9, _rx(r"not interested", r"not at this time", r"no further questions"), False),
+    # Closers that are only a "no" on their own ("nothing beats Python" is an answer).
+    (NO, 0.9, _rx(r"i do not(?! know)", r"i don't(?! know)", r"that's it", r"that is it", r"nothing", r"i'm all set",
+                  r"all set"), True),
+    (END_CALL, 0.95, _rx(r"end (?:the |this )?call", r"hang up", r"can we end", r"stop calling", r"i have to go",
+                         r"i need to go", r"goodbye", r"bye bye"), False),
+    (END_CALL, 0.95, _rx(r"bye", r"stop"), True),
+    (QUESTION, 0.92, _rx(r"i have a question", r"quick question", r"i wanted to ask", r"can you tell me",
+                         r"could you tell me", r"i'd like to know", r"i would like to know"), False),
+    (VOICEMAIL, 0.9, _rx(r"leave (?:me )?a message", r"leave your name", r"at the tone", r"after the tone", r"mailbox",
+                         r"voice ?mail", r"can't take your call", r"cannot take your call", r"can not take your call",
+                         r"record your message", r"the person you are calling", r"the number you have dialed"), False),
+    (VOICEMAIL, 0.5, _rx(r"beep", r"not available", r"get back to you", r"unavailable"), False),
+]
+
+# Auxiliaries like was/have/did also open answers with a dropped subject ("Have been working as..."),
+# so they only count as a question with a "?" (scored separately below).
+_INTERROGATIVE = re.compile(
+    r"^(?:what|why|how|when|where|who|whom|which|whose|can|could|do|does|is|are|will|would|should|shall|may|might)\b"
+)
+_DTMF = re.compile(r"^\s*([0-9*#])\s*$")
+_APOSTROPHES = str.maketrans({"’": "'", "‘": "'"})
+_NON_WORD = re.compile(r"[^a-z0-9'?\s]+")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    t = (text or "").lower().translate(_APOSTROPHES)
+    t = _NON_WORD.sub(" ", t)
+    return _SPACES.sub(" ", t).strip()
+
+
+def classify(text: str, digits: str = "") -> Intent:
+    """Best control intent for one caller utterance (speech text and/or DTMF digits)."""
+    d = _DTMF.match(digits or "") or _DTMF.match(text or "")
+    if d:
+        key = d.group(1)
+        if key == "1":
+            return Intent(YES, 1.0, {YES: 1.0})
+        if key == "2":
+            return Intent(NO, 1.0, {NO: 1.0})
+        return Intent(UNKNOWN, 0.0, {})
+
+    t = normalize(text)
+    if not t:
+        return Intent(UNKNOWN, 0.0, {})
+    words = t.replace("?", " ").split()
+    short = len(words) <= 4
+
+    scores: dict[str, float] = {}
+    for label, weight, pattern, short_only in _RULES:
+        if short_only and not short:
+            continue
+        for m in pattern.finditer(t):
+            w = weight
+            if label in (YES, NO) and len(words) > 8 and len(t[: m.start()].split()) >= 3:
+                # "yes"/"no" buried inside a long answer is weak evidence of consent.
+                w *= 0.75
+            if label == VOICEMAIL:
+                w = min(0.95, scores.get(label, 0.0) + w)
+            scores[label] = max(scores.get(label, 0.0), w)
+
+    if "?" in t:
+        scores[QUESTION] = max(scores.get(QUESTION, 0.0), 0.95)
+    elif _INTERROGATIVE.match(t) and len(words) >= 3:
+        scores[QUESTION] = max(scores.get(QUESTION, 0.0), 0.8)
+
+    if short and len(scores) == 1:
+        # A two-word "yes please" / "no thanks" is as clear as it gets.
+        (only, s), = scores.items()
+        scores[only] = max(s, 0.95)
+
+    if not scores:
+        return Intent(UNKNOWN, 0.0, scores)
+    ranked = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+    label, top = ranked[0]
+    confidence = top
+    for other, s in ranked[1:]:
+        if frozenset((label, other)) in _EXCLUSIVE:
+            confidence -= 0.5 * s
+    return Intent(label if confidence > 0 else UNKNOWN, round(max(0.0, confidence), 3), scores)
@@ -0,0 +1,470 @@
+"""One place every OpenAI call goes through.
+
+Call sites name themselves (``"interview_turn"``, ``"fit_evaluation"``, ...)
+and the gateway applies that site's timeout and retry budget on the shared
+pooled client. Three things happen on the way:
+
+* Single-flight: identical non-streaming requests already in flight are
+  joined instead of sent again (two dashboard tabs generating the same job
+  summary cost one completion).
+* Concurrency cap with priority: at most ``max_concurrency`` requests run at
+  once. ``background`` work (dashboard, init pipeline) may not take the last
+  ``live_reserve`` slots, and never jumps ahead of a waiting ``live`` call turn.
+* Deadlines and circuit breaking: a site with ``deadline_seconds`` gets a
+  hard wall-clock budget (queue wait included) and raises ``DeadlineExceeded``
+  when it is spent. Sites sharing a ``CircuitBreaker`` stop calling the
+  provider after consecutive failures or a p95 latency breach and fail fast
+  with ``CircuitOpen`` for a cool-down window, so live turns go straight to
+  their deterministic fallback during a brownout.
+* Metrics: per-site calls, errors, coalesced joins, queue wait, latency
+  percentiles and token usage, plus breaker state, for ``/voice/provider``.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Iterator
+
+LIVE = "live"
+BACKGROUND = "background"
+
+
+@dataclass(frozen=True)
+class SiteConfig:
+    timeout_seconds: float = 30.0
+    max_retries: int = 1
+    priority: str = BACKGROUND
+    # Hard budget for the whole call, queue wait included (0 = only the client timeout applies).
+    deadline_seconds: float = 0.0
+    breaker: str = ""
+
+
+class GatewayBusy(Exception):
+    """No concurrency slot freed up within the site's timeout."""
+
+
+class DeadlineExceeded(TimeoutError):
+    """The site's per-call deadline ran out before the provider answered."""
+
+
+class CircuitOpen(Exception):
+    """The site's breaker is open; the provider is not being called."""
+
+
+def _p95(values) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+
+
+class CircuitBreaker:
+    """Closed -> open after ``failure_threshold`` consecutive failures or a p95 breach;
+    open -> half-open after ``cooldown_seconds``; one probe call then closes or re-opens it."""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 3,
+        p95_threshold_ms: float = 0.0,
+        window: int = 20,
+        min_samples: int = 10,
+        cooldown_seconds: float = 30.0,
+        log: Callable[[str], None] | None = None,
+    ):
+        self.name = name
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.p95_threshold_ms = float(p95_threshold_ms)
+        self.min_samples = max(1, int(min_samples))
+        self.cooldown_seconds = max(0.0, float(cooldown_seconds))
+        self._log = log or (lambda _msg: None)
+        self._lock = threading.Lock()
+        self._latencies: deque[float] = deque(maxlen=max(self.min_samples, int(window)))
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._metrics = {"trips": 0, "short_circuited": 0, "last_trip_reason": ""}
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "open":
+                if time.monotonic() - self._opened_at < self.cooldown_seconds:
+                    self._metrics["short_circuited"] += 1
+                    return False
+                self.state = "half_open"
+            if self.state == "half_open":
+                if self._probing:
+                    self._metrics["short_circuited"] += 1
+                    return False
+                self._probing = True
+            return True
+
+    def is_open(self) -> bool:
+        """True while calls would be refused (does not consume the half-open probe)."""
+        with self._lock:
+            if self.state == "open":
+                return time.monotonic() - self._opened_at < self.cooldown_seconds
+            return self.state == "half_open" and self._probing
+
+    def record_success(self, latency_ms: float) -> None:
+        with self._lock:
+            self._failures = 0
+            if self.state == "half_open":
+                if self.p95_threshold_ms and latency_ms > self.p95_threshold_ms:
+                    self._trip(f"slow probe {latency_ms:.0f}ms")
+                else:
+                    self._close()
+                return
+            self._latencies.append(latency_ms)
+            if self.p95_threshold_ms and len(self._latencies) >= self.min_samples:
+                p95 = _p95(self._latencies)
+                if p95 > self.p95_threshold_ms:
+                    self._trip(f"p95 {p95:.0f}ms > {self.p95_threshold_ms:.0f}ms")
+
+    def record_failure(self, reason: str) -> None:
+        with self._lock:
+            self._failures += 1
+            if self.state == "half_open":
+                self._trip(f"probe failed: {reason}")
+            elif self.state == "closed" and self._failures >= self.failure_threshold:
+                self._trip(f"{self._failures} consecutive failures, last: {reason}")
+
+    def release_probe(self) -> None:
+        """The half-open probe ended without a verdict (caller went away); let the next call probe."""
+        with self._lock:
+            if self.state == "half_open":
+                self._probing = False
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            retry_in = 0.0
+            if self.state == "open":
+                retry_in = max(0.0, self.cooldown_seconds - (time.monotonic() - self._opened_at))
+            return {
+                **self._metrics,
+                "state": self.state,
+                "consecutive_failures": self._failures,
+                "p95_ms": round(_p95(self._latencies), 1),
+                "samples": len(self._latencies),
+                "retry_in_seconds": round(retry_in, 1),
+            }
+
+    def _trip(self, reason: str) -> None:
+        self.state = "open"
+        self._opened_at = time.monotonic()
+        self._probing = False
+        self._latencies.clear()
+        self._metrics["trips"] += 1
+        self._metrics["last_trip_reason"] = reason[:200]
+        self._log(f"LLM_BREAKER_OPEN name={self.name} cooldown={self.cooldown_seconds}s | {reason}")
+
+    def _close(self) -> None:
+        self.state = "closed"
+        self._failures = 0
+        self._probing = False
+        self._latencies.clear()
+        self._log(f"LLM_BREAKER_CLOSED name={self.name}")
+
+
+class _PrioritySlots:
+    def __init__(self, capacity: int, live_reserve: int):
+        self.capacity = max(1, int(capacity))
+        self.live_reserve = min(max(0, int(live_reserve)), self.capacity - 1)
+        self.active = 0
+        self.waiting_live = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, priority: str, timeout: float) -> bool:
+        deadline = time.monotonic() + max(0.0, timeout)
+        live = priority == LIVE
+        with self._cond:
+            if live:
+                self.waiting_live += 1
+            try:
+                while not self._can_run(live):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+                self.active += 1
+                return True
+            finally:
+                if live:
+                    self.waiting_live -= 1
+
+    def release(self) -> None:
+        with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+    def _can_run(self, live: bool) -> bool:
+        if live:
+            return self.active < self.capacity
+        return self.waiting_live == 0 and self.active < self.capacity - self.live_reserve
+
+
+class _Flight:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: BaseException | None = None
+
+
+class _SiteStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.coalesced = 0
+        self.busy = 0
+        self.deadline_misses = 0
+        self.short_circuited = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.queue_wait_ms_total = 0.0
+        self.latencies_ms: deque[float] = deque(maxlen=256)
+        self.first_token_ms: deque[float] = deque(maxlen=256)
+
+    @staticmethod
+    def _pct(values, q: float) -> float:
+        if not values:
+            return 0.0
+        ordered = sorted(values)
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 1)
+
+    def snapshot(self) -> dict:
+        out = {
+            "calls": self.calls,
+            "errors": self.errors,
+            "coalesced": self.coalesced,
+            "busy": self.busy,
+            "deadline_misses": self.deadline_misses,
+            "short_circuited": self.short_circuited,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "queue_wait_ms_avg": round(self.queue_wait_ms_total / self.calls, 1) if self.calls else 0.0,
+            "latency_ms_p50": self._pct(self.latencies_ms, 0.5),
+            "latency_ms_p95": self._pct(self.latencies_ms, 0.95),
+        }
+        if self.first_token_ms:
+            out["first_token_ms_p50"] = self._pct(self.first_token_ms, 0.5)
+            out["first_token_ms_p95"] = self._pct(self.first_token_ms, 0.95)
+        return out
+
+
+class LLMGateway:
+    def __init__(
+        self,
+        client_factory: Callable[[], Any],
+        sites: dict[str, SiteConfig] | None = None,
+        max_concurrency: int = 16,
+        live_reserve: int = 4,
+        breakers: dict[str, CircuitBreaker] | None = None,
+        log: Callable[[str], None] | None = None,
+    ):
+        self._client_factory = client_factory
+        self.sites = dict(sites or {})
+        self.breakers = dict(breakers or {})
+        self._slots = _PrioritySlots(max_concurrency, live_reserve)
+        # Deadline-bound calls run here so the caller can stop waiting; the slot is held until the call really ends.
+        self._deadline_pool = ThreadPoolExecutor(max_workers=self._slots.capacity, thread_name_prefix="llm-deadline")
+        self._log = log or (lambda _msg: None)
+        self._lock = threading.Lock()
+        self._inflight: dict[str, _Flight] = {}
+        self._stats: dict[str, _SiteStats] = {}
+
+    def site(self, name: str) -> SiteConfig:
+        return self.sites.get(name) or SiteConfig()
+
+    def available(self, site: str) -> bool:
+        """False while ``site``'s breaker is open; callers use it to skip straight to their fallback."""
+        breaker = self.breakers.get(self.site(site).breaker)
+        return breaker is None or not breaker.is_open()
+
+    # -- public API -------------------------------------------------------------
+
+    def complete(self, site: str, *, coalesce: bool = True, **request):
+        """``chat.completions.create(**request)`` under ``site``'s limits. Returns the SDK response."""
+        return self.run(site, lambda client: client.chat.completions.create(**request), key=self._key(site, request) if coalesce else None)
+
+    def stream(self, site: str, **request) -> Iterator[Any]:
+        """Streamed ``chat.completions.create``; yields chunks. The slot is held until the stream is drained."""
+        # The deadline bounds time to first token (via the client's read timeout); once
+        # sentences are being spoken the rest of the reply is allowed to finish.
+        cfg = self.site(site)
+        stats = self._site_stats(site)
+        breaker = self._admit(site, cfg, stats)
+        self._acquire(site, cfg, stats, breaker)
+        started = time.monotonic()
+        first = None
+        settled = False
+        try:
+            client = self._client(cfg)
+            req = {**request, "stream": True, "stream_options": {"include_usage": True}}
+            for chunk in client.chat.completions.create(**req):
+                if first is None and getattr(chunk, "choices", None):
+                    first = time.monotonic()
+                self._record_usage(stats, getattr(chunk, "usage", None))
+                yield chunk
+        except Exception as e:
+            settled = True
+            self._failed(stats, breaker, e)
+            raise
+        else:
+            settled = True
+            if breaker is not None:
+                breaker.record_success(((first or time.monotonic()) - started) * 1000.0)
+        finally:
+            self._slots.release()
+            with self._lock:
+                stats.latencies_ms.append((time.monotonic() - started) * 1000.0)
+                if first is not None:
+                    stats.first_token_ms.append((first - started) * 1000.0)
+            # Closed early (GeneratorExit) or abandoned: neither a success nor a failure.
+            if breaker is not None and not settled:
+                breaker.release_probe()
+
+    def run(self, site: str, fn: Callable[[Any], Any], key: str | None = None):
+        """Run ``fn(client)`` under ``site``'s timeout, retries and concurrency slot."""
+        cfg = self.site(site)
+        stats = self._site_stats(site)
+        if key is None:
+            return self._execute(site, cfg, stats, fn)
+
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+            else:
+                stats.coalesced += 1
+        if not leader:
+            if not flight.done.wait(cfg.timeout_seconds * (cfg.max_retries + 1) + 5):
+                raise TimeoutError(f"LLM {site}: coalesced request did not finish")
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = self._execute(site, cfg, stats, fn)
+            return flight.result
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.done.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            sites = {name: s.snapshot() for name, s in self._stats.items()}
+        return {
+            "max_concurrency": self._slots.capacity,
+            "live_reserve": self._slots.live_reserve,
+            "active": self._slots.active,
+            "waiting_live": self._slots.waiting_live,
+            "breakers": {name: b.snapshot() for name, b in self.breakers.items()},
+            "sites": sites,
+        }
+
+    def close(self) -> None:
+        self._deadline_pool.shutdown(wait=False, cancel_futures=True)
+
+    # -- internals --------------------------------------------------------------
+
+    def _client(self, cfg: SiteConfig):
+        client = self._client_factory()
+        with_options = getattr(client, "with_options", None)
+        if callable(with_options):
+            timeout = min(cfg.timeout_seconds, cfg.deadline_seconds) if cfg.deadline_seconds else cfg.timeout_seconds
+            client = with_options(timeout=timeout, max_retries=cfg.max_retries)
+        return client
+
+    def _site_stats(self, site: str) -> _SiteStats:
+        with self._lock:
+            stats = self._stats.get(site)
+            if stats is None:
+                stats = self._stats[site] = _SiteStats()
+            return stats
+
+    def _admit(self, site: str, cfg: SiteConfig, stats: _SiteStats) -> CircuitBreaker | None:
+        breaker = self.breakers.get(cfg.breaker) if cfg.breaker else None
+        if breaker is not None and not breaker.allow():
+            with self._lock:
+                stats.short_circuited += 1
+            raise CircuitOpen(f"LLM {site}: breaker {breaker.name} is open")
+        return breaker
+
+    def _acquire(self, site: str, cfg: SiteConfig, stats: _SiteStats, breaker: CircuitBreaker | None) -> float:
+        """Take a slot within the site's budget; returns the seconds spent queued."""
+        queued = time.monotonic()
+        budget = cfg.deadline_seconds or cfg.timeout_seconds
+        if not self._slots.acquire(cfg.priority, budget):
+            with self._lock:
+                stats.busy += 1
+            if breaker is not None:
+                breaker.record_failure("no free slot")
+            self._log(f"LLM_GATEWAY_BUSY site={site} priority={cfg.priority}")
+            raise GatewayBusy(f"LLM {site}: no free slot within {budget}s")
+        waited = time.monotonic() - queued
+        with self._lock:
+            stats.calls += 1
+            stats.queue_wait_ms_total += waited * 1000.0
+        return waited
+
+    def _failed(self, stats: _SiteStats, breaker: CircuitBreaker | None, error: BaseException) -> None:
+        with self._lock:
+            stats.errors += 1
+        if breaker is not None:
+            breaker.record_failure(f"{type(error).__name__}: {error}"[:200])
+
+    def _execute(self, site: str, cfg: SiteConfig, stats: _SiteStats, fn: Callable[[Any], Any]):
+        breaker = self._admit(site, cfg, stats)
+        waited = self._acquire(site, cfg, stats, breaker)
+        started = time.monotonic()
+        try:
+            if not cfg.deadline_seconds:
+                try:
+                    result = fn(self._client(cfg))
+                finally:
+                    self._slots.release()
+            else:
+                future = self._deadline_pool.submit(lambda: fn(self._client(cfg)))
+                future.add_done_callback(lambda _f: self._slots.release())
+                done, _ = wait([future], timeout=max(0.0, cfg.deadline_seconds - waited))
+                if not done:
+                    with self._lock:
+                        stats.deadline_misses += 1
+                    raise DeadlineExceeded(f"LLM {site}: no answer within {cfg.deadline_seconds}s")
+                result = future.result()
+        except Exception as e:
+            self._failed(stats, breaker, e)
+            raise
+        finally:
+            with self._lock:
+                stats.latencies_ms.append((time.monotonic() - started) * 1000.0)
+        if breaker is not None:
+            breaker.record_success((time.monotonic() - started) * 1000.0)
+        self._record_usage(stats, getattr(result, "usage", None))
+        return result
+
+    def _record_usage(self, stats: _SiteStats, usage) -> None:
+        if usage is None:
+            return
+        with self._lock:
+            stats.prompt_tokens += int(getattr(usage, "prompt_tokens", 0) or 0)
+            stats.completion_tokens += int(getattr(usage, "completion_tokens", 0) or 0)
+
+    @staticmethod
+    def _key(site: str, request: dict) -> str:
+        body = json.dumps(request, sort_keys=True, default=str)
+        return site + ":" + hashlib.sha1(body.encode("utf-8")).hexdigest()
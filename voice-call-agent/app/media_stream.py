@@ -0,0 +1,415 @@
+"""Twilio Media Streams transport for interview turns.
+
+The ``<Gather>`` loop adds a fixed ``speech_timeout`` of silence plus Twilio's
+own speech recognition before every turn. With a bidirectional Media Stream we
+receive the caller's 8 kHz μ-law audio directly, decide end-of-utterance
+locally with an energy VAD, hand the utterance to the configured STT, and
+stream reply audio back on the same socket.
+
+Everything provider-specific is injected (``transcribe``, ``respond``,
+``synthesize``, ``send``), so a recorded WAV can be replayed through
+``MediaStreamSession`` without Twilio, an STT vendor or a network.
+"""
+
+from __future__ import annotations
+
+import array
+import asyncio
+import base64
+import io
+import math
+import struct
+import wave
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Iterable
+
+try:
+    import audioop  # C implementation; removed from the stdlib in Python 3.13
+except Exception:
+    audioop = None
+
+SAMPLE_RATE = 8000
+FRAME_MS = 20
+FRAME_BYTES = SAMPLE_RATE * FRAME_MS // 1000  # one μ-law byte per sample
+
+_ULAW_BIAS = 0x84
+_ULAW_CLIP = 32635
+
+
+def _ulaw_byte_to_linear(u: int) -> int:
+    u = ~u & 0xFF
+    sign = u & 0x80
+    exponent = (u >> 4) & 0x07
+    mantissa = u & 0x0F
+    sample = (((mantissa << 3) + _ULAW_BIAS) << exponent) - _ULAW_BIAS
+    return -sample if sign else sample
+
+
+def _linear_to_ulaw_byte(sample: int) -> int:
+    sign = 0x80 if sample < 0 else 0
+    if sign:
+        sample = -sample
+    sample = min(sample, _ULAW_CLIP) + _ULAW_BIAS
+    exponent = 7
+    mask = 0x4000
+    while exponent > 0 and not (sample & mask):
+        exponent -= 1
+        mask >>= 1
+    mantissa = (sample >> (exponent + 3)) & 0x0F
+    return ~(sign | (exponent << 4) | mantissa) & 0xFF
+
+
+_ULAW_DECODE = [_ulaw_byte_to_linear(i) for i in range(256)]
+
+
+def ulaw_to_pcm16(data: bytes) -> bytes:
+    """μ-law bytes -> little-endian signed 16-bit PCM."""
+    if audioop:
+        return audioop.ulaw2lin(data, 2)
+    return array.array("h", (_ULAW_DECODE[b] for b in data)).tobytes()
+
+
+def pcm16_to_ulaw(data: bytes) -> bytes:
+    """Little-endian signed 16-bit PCM -> μ-law bytes."""
+    if audioop:
+        return audioop.lin2ulaw(data, 2)
+    samples = array.array("h")
+    samples.frombytes(data[: len(data) - (len(data) % 2)])
+    return bytes(_linear_to_ulaw_byte(s) for s in samples)
+
+
+def pcm16_rms(data: bytes) -> float:
+    if not data:
+        return 0.0
+    if audioop:
+        return float(audioop.rms(data, 2))
+    samples = array.array("h")
+    samples.frombytes(data[: len(data) - (len(data) % 2)])
+    if not samples:
+        return 0.0
+    return math.sqrt(sum(s * s for s in samples) / len(samples))
+
+
+def pcm16_to_wav(pcm: bytes, sample_rate: int = SAMPLE_RATE) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(pcm)
+    return buf.getvalue()
+
+
+def ulaw_to_wav(ulaw: bytes, sample_rate: int = SAMPLE_RATE) -> bytes:
+    """Wrap raw μ-law bytes in a WAVE_FORMAT_MULAW header (the ``wave`` module only writes PCM)."""
+    n = len(ulaw)
+    fmt = struct.pack("<HHIIHHH", 7, 1, sample_rate, sample_rate, 1, 8, 0)
+    body = b"WAVE" + b"fmt " + struct.pack("<I", len(fmt)) + fmt + b"fact" + struct.pack("<II", 4, n)
+    body += b"data" + struct.pack("<I", n) + ulaw + (b"\0" if n % 2 else b"")
+    return b"RIFF" + struct.pack("<I", len(body)) + body
+
+
+def wav_to_ulaw_frames(path_or_bytes, frame_ms: int = FRAME_MS) -> list[bytes]:
+    """Load a recorded WAV fixture as the μ-law frames Twilio would send.
+
+    Accepts mono/stereo 16-bit PCM at any rate, or 8 kHz μ-law WAVs.
+    """
+    src = io.BytesIO(path_or_bytes) if isinstance(path_or_bytes, (bytes, bytearray)) else path_or_bytes
+    with wave.open(src, "rb") as w:
+        channels, width, rate = w.getnchannels(), w.getsampwidth(), w.getframerate()
+        raw = w.readframes(w.getnframes())
+        comptype = w.getcomptype()
+    if comptype not in ("NONE", "not compressed"):
+        raise ValueError(f"unsupported WAV compression: {comptype}")
+    if width == 1 and rate == SAMPLE_RATE and channels == 1:
+        # 8-bit WAVs from telephony tools are usually μ-law already.
+        ulaw = raw
+    else:
+        if width != 2:
+            raise ValueError("fixture WAVs must be 16-bit PCM or 8 kHz μ-law")
+        pcm = raw
+        if channels == 2:
+            pcm = audioop.tomono(pcm, 2, 0.5, 0.5) if audioop else _downmix(pcm)
+        if rate != SAMPLE_RATE:
+            pcm = audioop.ratecv(pcm, 2, 1, rate, SAMPLE_RATE, None)[0] if audioop else _resample(pcm, rate)
+        ulaw = pcm16_to_ulaw(pcm)
+    step = SAMPLE_RATE * frame_ms // 1000
+    return [ulaw[i:i + step] for i in range(0, len(ulaw), step)]
+
+
+def _downmix(pcm: bytes) -> bytes:
+    s = array.array("h")
+    s.frombytes(pcm)
+    return array.array("h", ((s[i] + s[i + 1]) // 2 for i in range(0, len(s) - 1, 2))).tobytes()
+
+
+def _resample(pcm: bytes, rate: int) -> bytes:
+    s = array.array("h")
+    s.frombytes(pcm)
+    n = int(len(s) * SAMPLE_RATE / rate)
+    return array.array("h", (s[min(len(s) - 1, int(i * rate / SAMPLE_RATE))] for i in range(n))).tobytes()
+
+
+@dataclass
+class VadConfig:
+    frame_ms: int = FRAME_MS
+    min_rms: float = 350.0
+    noise_ratio: float = 3.0
+    speech_start_ms: int = 60
+    end_silence_ms: int = 700
+    min_utterance_ms: int = 250
+    max_utterance_ms: int = 15000
+    pre_roll_ms: int = 200
+
+
+class EnergyVAD:
+    """Energy-based endpointing over 20 ms PCM frames with an adaptive noise floor."""
+
+    def __init__(self, config: VadConfig | None = None):
+        self.cfg = config or VadConfig()
+        self.noise_floor = 0.0
+        self.in_speech = False
+        self._voiced_run = 0
+        self._silence_run = 0
+        self._frames: list[bytes] = []
+        self._pre_roll: list[bytes] = []
+
+    def _frames_for(self, ms: int) -> int:
+        return max(1, ms // self.cfg.frame_ms)
+
+    def threshold(self) -> float:
+        return max(self.cfg.min_rms, self.noise_floor * self.cfg.noise_ratio)
+
+    def process(self, pcm_frame: bytes) -> tuple[str | None, bytes | None]:
+        """Feed one frame. Returns ("speech_start", None), ("speech_end", utterance_pcm) or (None, None)."""
+        rms = pcm16_rms(pcm_frame)
+        voiced = rms >= self.threshold()
+
+        if not self.in_speech:
+            if not voiced:
+                # Track background level only while nobody is talking.
+                self.noise_floor = rms if self.noise_floor == 0 else 0.95 * self.noise_floor + 0.05 * rms
+            self._pre_roll.append(pcm_frame)
+            self._pre_roll = self._pre_roll[-self._frames_for(self.cfg.pre_roll_ms):]
+            self._voiced_run = self._voiced_run + 1 if voiced else 0
+            if self._voiced_run >= self._frames_for(self.cfg.speech_start_ms):
+                self.in_speech = True
+                self._silence_run = 0
+                self._frames = list(self._pre_roll)
+                self._pre_roll = []
+                return "speech_start", None
+            return None, None
+
+        self._frames.append(pcm_frame)
+        self._silence_run = 0 if voiced else self._silence_run + 1
+        too_long = len(self._frames) >= self._frames_for(self.cfg.max_utterance_ms)
+        if self._silence_run >= self._frames_for(self.cfg.end_silence_ms) or too_long:
+            frames, self._frames = self._frames, []
+            self.in_speech = False
+            self._voiced_run = 0
+            if not too_long:
+                frames = frames[: len(frames) - self._silence_run] or frames
+            self._silence_run = 0
+            if len(frames) < self._frames_for(self.cfg.min_utterance_ms):
+                return None, None
+            return "speech_end", b"".join(frames)
+        return None, None
+
+
+class MediaStreamSession:
+    """One Twilio Media Stream: VAD endpointing in, sentence-by-sentence audio out.
+
+    ``transcribe(wav_bytes) -> str`` and ``synthesize(sentence) -> ulaw_bytes`` are
+    blocking and run in worker threads. ``respond(text, emit)`` is blocking too and
+    calls ``emit(sentence)`` per sentence as soon as each is ready, so the first
+    sentence plays while the rest of the reply is still being generated.
+    ``should_end()`` (also blocking, run in a worker thread) is checked after each
+    reply to finish the stream.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[dict], Awaitable[None]],
+        transcribe: Callable[[bytes], str],
+        respond: Callable[[str, Callable[[str], None]], None],
+        synthesize: Callable[[str], bytes],
+        should_end: Callable[[], bool] | None = None,
+        vad_config: VadConfig | None = None,
+        log: Callable[[str], None] | None = None,
+        chunk_ms: int = 200,
+        playback_wait_seconds: float = 10.0,
+    ):
+        self._send = send
+        self._transcribe = transcribe
+        self._respond = respond
+        self._synthesize = synthesize
+        self._should_end = should_end or (lambda: False)
+        self._log = log or (lambda _msg: None)
+        self.vad = EnergyVAD(vad_config)
+        self.chunk_bytes = SAMPLE_RATE * chunk_ms // 1000
+        self.playback_wait_seconds = playback_wait_seconds
+
+        self.stream_sid = ""
+        self.call_sid = ""
+        self.custom_parameters: dict = {}
+        self.transcripts: list[str] = []
+        self.replies: list[str] = []
+        self.ended = asyncio.Event()
+
+        self._utterances: asyncio.Queue = asyncio.Queue()
+        self._worker: asyncio.Task | None = None
+        self._pending_marks: set[str] = set()
+        self._marks_drained = asyncio.Event()
+        self._marks_drained.set()
+        self._mark_seq = 0
+        self._reply_generation = 0
+
+    # -- inbound ---------------------------------------------------------------
+
+    async def handle(self, message: dict) -> bool:
+        """Process one Twilio stream message. Returns False once the stream is over."""
+        event = message.get("event")
+        if event == "start":
+            start = message.get("start") or {}
+            self.stream_sid = message.get("streamSid") or start.get("streamSid") or ""
+            self.call_sid = start.get("callSid") or ""
+            self.custom_parameters = start.get("customParameters") or {}
+            self._worker = asyncio.create_task(self._turn_worker())
+        elif event == "media":
+            media = message.get("media") or {}
+            if media.get("track", "inbound") != "inbound":
+                return True
+            await self.feed_ulaw(base64.b64decode(media.get("payload") or ""))
+        elif event == "mark":
+            name = (message.get("mark") or {}).get("name", "")
+            self._pending_marks.discard(name)
+            if not self._pending_marks:
+                self._marks_drained.set()
+        elif event == "stop":
+            await self.close()
+            return False
+        return not self.ended.is_set()
+
+    async def feed_ulaw(self, ulaw: bytes) -> None:
+        for i in range(0, len(ulaw), FRAME_BYTES):
+            state, utterance = self.vad.process(ulaw_to_pcm16(ulaw[i:i + FRAME_BYTES]))
+            if state == "speech_start" and self.speaking:
+                await self.barge_in()
+            elif state == "speech_end":
+                await self._utterances.put(utterance)
+
+    @property
+    def speaking(self) -> bool:
+        return bool(self._pending_marks)
+
+    async def barge_in(self) -> None:
+        """Caller started talking over us: drop queued audio and any unsent sentences."""
+        self._reply_generation += 1
+        self._pending_marks.clear()
+        self._marks_drained.set()
+        await self._send({"event": "clear", "streamSid": self.stream_sid})
+
+    # -- turns -----------------------------------------------------------------
+
+    async def _turn_worker(self) -> None:
+        while True:
+            utterance = await self._utterances.get()
+            try:
+                if utterance is None:
+                    return
+                await self.run_turn(utterance)
+            except Exception as e:
+                self._log(f"MEDIA_STREAM_TURN_FAIL call_sid={self.call_sid} | {e}")
+            finally:
+                self._utterances.task_done()
+            # May read a remote session store; keep it off the event loop like the other callbacks.
+            if await asyncio.to_thread(self._should_end):
+                await self._finish()
+                return
+
+    async def run_turn(self, utterance_pcm: bytes) -> None:
+        text = (await asyncio.to_thread(self._transcribe, pcm16_to_wav(utterance_pcm)) or "").strip()
+        if not text:
+            return
+        self.transcripts.append(text)
+        generation = self._reply_generation
+        loop = asyncio.get_running_loop()
+        sentences: asyncio.Queue = asyncio.Queue()
+
+        def _emit(sentence: str) -> None:
+            loop.call_soon_threadsafe(sentences.put_nowait, sentence)
+
+        def _produce() -> None:
+            try:
+                self._respond(text, _emit)
+            finally:
+                loop.call_soon_threadsafe(sentences.put_nowait, None)
+
+        producer = loop.run_in_executor(None, _produce)
+        while True:
+            sentence = await sentences.get()
+            if sentence is None:
+                break
+            if generation != self._reply_generation:
+                continue  # barged in: let the producer finish, speak nothing more of this reply
+            self.replies.append(sentence)
+            try:
+                audio = await asyncio.to_thread(self._synthesize, sentence)
+            except Exception as e:
+                self._log(f"MEDIA_STREAM_TTS_FAIL | {e}")
+                continue
+            if generation == self._reply_generation:
+                await self.send_audio(audio)
+        await producer
+
+    async def send_audio(self, ulaw: bytes) -> None:
+        for i in range(0, len(ulaw), self.chunk_bytes):
+            payload = base64.b64encode(ulaw[i:i + self.chunk_bytes]).decode("ascii")
+            await self._send({"event": "media", "streamSid": self.stream_sid, "media": {"payload": payload}})
+        self._mark_seq += 1
+        name = f"reply-{self._mark_seq}"
+        self._pending_marks.add(name)
+        self._marks_drained.clear()
+        await self._send({"event": "mark", "streamSid": self.stream_sid, "mark": {"name": name}})
+
+    async def _finish(self) -> None:
+        # Let the last sentence finish playing before the socket (and the <Connect>) ends.
+        try:
+            await asyncio.wait_for(self._marks_drained.wait(), timeout=self.playback_wait_seconds)
+        except asyncio.TimeoutError:
+            pass
+        self.ended.set()
+
+    async def drain(self) -> None:
+        """Wait until every endpointed utterance has been answered."""
+        if self._worker and not self._worker.done():
+            joined = asyncio.ensure_future(self._utterances.join())
+            # The worker stops early when the interview ends; don't wait on utterances it will never take.
+            await asyncio.wait({joined, self._worker}, return_when=asyncio.FIRST_COMPLETED)
+            joined.cancel()
+
+    async def close(self) -> None:
+        # The caller is gone; don't spend STT/LLM/TTS on utterances still queued.
+        if self._worker and not self._worker.done():
+            self._worker.cancel()
+            try:
+                await self._worker
+            except (asyncio.CancelledError, Exception):
+                pass
+        self.ended.set()
+
+
+async def replay_frames(session: MediaStreamSession, frames: Iterable[bytes], stream_sid: str = "MZtest", custom_parameters: dict | None = None) -> MediaStreamSession:
+    """Drive a session with recorded μ-law frames as if Twilio were sending them."""
+    await session.handle({"event": "start", "streamSid": stream_sid, "start": {"streamSid": stream_sid, "callSid": "CAtest", "customParameters": custom_parameters or {}}})
+    for frame in frames:
+        payload = base64.b64encode(frame).decode("ascii")
+        if not await session.handle({"event": "media", "streamSid": stream_sid, "media": {"track": "inbound", "payload": payload}}):
+            break
+    # Trailing silence so an utterance that runs to the end of the file is endpointed.
+    silence = bytes([0xFF]) * FRAME_BYTES
+    for _ in range(session.vad._frames_for(session.vad.cfg.end_silence_ms) + 1):
+        await session.feed_ulaw(silence)
+    await session.drain()
+    await session.handle({"event": "stop", "streamSid": stream_sid})
+    return session
@@ -0,0 +1,184 @@
+"""Sentence-level streaming of interviewer replies.
+
+A chat completion streams tokens; waiting for the whole reply before
+synthesizing audio makes the caller sit through LLM + TTS for the full text.
+``SentenceSegmenter`` cuts the token stream into speakable sentences as soon as
+each one is complete, and ``ReplyStream`` hands those sentences from the
+producing thread to whichever webhook (or media-stream socket) is speaking them.
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+import time
+
+# Words that end in "." without ending the sentence.
+_ABBREVIATIONS = {
+    "mr", "mrs", "ms", "dr", "prof", "sr", "jr", "st", "vs", "etc", "inc", "ltd",
+    "co", "corp", "e.g", "i.e", "approx", "dept", "no", "u.s", "a.m", "p.m",
+}
+
+_BOUNDARY = re.compile(r"[.!?]+[\"')\]]*(?=\s)")
+
+
+def _normalize(text: str) -> str:
+    return " ".join((text or "").split())
+
+
+class SentenceSegmenter:
+    """Incrementally split streamed text into complete sentences."""
+
+    def __init__(self, min_chars: int = 2):
+        self.min_chars = max(1, int(min_chars))
+        self._buf = ""
+
+    def feed(self, delta: str) -> list[str]:
+        """Add streamed text; return sentences that are now known to be complete."""
+        self._buf += delta or ""
+        out: list[str] = []
+        start = 0
+        for m in _BOUNDARY.finditer(self._buf):
+            end = m.end()
+            candidate = self._buf[start:end].strip()
+            if len(candidate) < self.min_chars or self._ends_with_abbreviation(self._buf[start:m.start() + 1]):
+                continue
+            out.append(candidate)
+            start = end
+        self._buf = self._buf[start:].lstrip() if start else self._buf
+        return out
+
+    def flush(self) -> list[str]:
+        """Return whatever is left once the stream has ended."""
+        rest = self._buf.strip()
+        self._buf = ""
+        return [rest] if rest else []
+
+    @staticmethod
+    def _ends_with_abbreviation(text: str) -> bool:
+        words = text.strip().split()
+        if not words:
+            return False
+        last = words[-1].lower().rstrip(".")
+        # Single letters ("J. Smith") and known abbreviations do not end a sentence.
+        return last in _ABBREVIATIONS or (len(last) == 1 and last.isalpha())
+
+
+def split_sentences(text: str, min_chars: int = 2) -> list[str]:
+    seg = SentenceSegmenter(min_chars=min_chars)
+    return seg.feed(text) + seg.flush()
+
+
+class ReplyStream:
+    """Thread-safe hand-off of one reply's sentences from producer to speaker.
+
+    The producer calls ``push`` per sentence and ``finish`` with the final reply
+    text, which may differ from the streamed sentences if post-processing
+    rewrote it. The consumer calls ``take`` for sentences as they arrive and
+    ``take_remaining`` once the stream is done; ``spoken_text`` is then what the
+    caller actually heard, for the transcript.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._sentences: list[str] = []
+        self._cursor = 0
+        self._said: list[str] = []
+        self.done = False
+        self.final_text = ""
+        self.created_at = time.monotonic()
+        self.first_sentence_at: float | None = None
+
+    def push(self, sentence: str) -> None:
+        sentence = (sentence or "").strip()
+        if not sentence:
+            return
+        with self._cond:
+            if self.first_sentence_at is None:
+                self.first_sentence_at = time.monotonic()
+            self._sentences.append(sentence)
+            self._cond.notify_all()
+
+    def finish(self, final_text: str = "") -> None:
+        with self._cond:
+            self.final_text = (final_text or "").strip()
+            self.done = True
+            self._cond.notify_all()
+
+    def take(self, timeout: float) -> list[str]:
+        """Wait up to ``timeout`` for unspoken sentences (or completion) and return them."""
+        deadline = time.monotonic() + max(0.0, timeout)
+        with self._cond:
+            while self._cursor >= len(self._sentences) and not self.done:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            out = self._sentences[self._cursor:]
+            self._cursor = len(self._sentences)
+            self._said.extend(out)
+            return out
+
+    def take_remaining(self) -> list[str]:
+        """After ``finish``: what is still to be said so the caller hears ``final_text``."""
+        with self._cond:
+            spoken = _normalize(" ".join(self._sentences[:self._cursor]))
+            streamed = _normalize(" ".join(self._sentences))
+            final = _normalize(self.final_text)
+            if not final or final == streamed:
+                out = self._sentences[self._cursor:]
+            elif not spoken:
+                # Nothing spoken yet: say the final reply whole, as one clip, so it keys the
+                # same TTS cache entry as the non-streamed path.
+                out = [final]
+            elif final.startswith(spoken):
+                # Post-processing appended to the streamed reply.
+                out = split_sentences(final[len(spoken):])
+            else:
+                # Rewritten after sentences were already spoken. Rewrites are a bridge sentence
+                # plus the next question (or hand-off notice); only that last part is still worth
+                # hearing, never the whole replacement on top of what was said.
+                parts = split_sentences(final)
+                heard = {_normalize(x) for x in self._sentences[:self._cursor]}
+                out = [x for x in (parts[1:] or parts) if _normalize(x) not in heard]
+            self._cursor = len(self._sentences)
+            self._said.extend(out)
+            return out
+
+    def spoken_text(self) -> str:
+        """Everything handed out to be said so far."""
+        with self._cond:
+            return " ".join(self._said)
+
+    def produced(self) -> dict:
+        """Producer-side state, for continuing the stream in another worker process."""
+        with self._cond:
+            return {"sentences": list(self._sentences), "done": self.done, "final_text": self.final_text}
+
+    def consumed(self) -> dict:
+        """Consumer-side state: how far the caller has been spoken to."""
+        with self._cond:
+            return {"cursor": self._cursor, "said": list(self._said)}
+
+    def sync_consumed(self, state: dict | None) -> None:
+        """Catch up with sentences another process already handed out."""
+        if not state:
+            return
+        with self._cond:
+            cursor = min(int(state.get("cursor") or 0), len(self._sentences))
+            if cursor > self._cursor:
+                self._cursor = cursor
+                self._said = list(state.get("said") or [])
+
+    @classmethod
+    def restore(cls, produced: dict, consumed: dict | None = None) -> "ReplyStream":
+        """Rebuild a stream from ``produced()`` / ``consumed()`` state read back from a shared store."""
+        stream = cls()
+        stream._sentences = [str(x) for x in produced.get("sentences") or []]
+        stream.done = bool(produced.get("done"))
+        stream.final_text = str(produced.get("final_text") or "")
+        stream.sync_consumed(consumed)
+        return stream
+
+    def age_seconds(self) -> float:
+        return time.monotonic() - self.created_at
@@ -0,0 +1,170 @@
+"""Compact in-memory representation of an interview session.
+
+Sessions used to be plain dicts holding their own copy of the job description,
+so a process that screened hundreds of candidates for the same role kept
+hundreds of copies of the same JD text, plus a per-instance dict for every
+session. ``SessionRecord`` keeps the dict interface the handlers use
+(``s["x"]``, ``s.get``, ``s.setdefault``, ``"x" in s``) but stores the known
+fields in ``__slots__`` and interns the job description through a shared
+``TextPool`` keyed by job_id. Keys outside the known set still work; they land
+in a small overflow dict.
+
+``deep_sizeof`` backs the memory gauge: it walks a value graph once, counting
+shared objects (interned JD text) a single time.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import sys
+import threading
+from collections.abc import Mapping, MutableMapping
+
+FIELDS = (
+    "status", "ready", "start_triggered", "job_description", "resume", "job_title", "job_id",
+    "candidate_name", "candidate_phone", "candidate_email", "candidate_id", "job_summary", "skills",
+    "fit_evaluation", "plan", "current_idx", "current_question", "completed_questions", "scores",
+    "clarifications", "started", "completed", "call_in_progress", "last_call_status", "recommendation",
+    "calls", "created_at", "intro_phase", "callback_received", "silence_count", "dialogue",
+    "agent_profile", "assistant_name", "elevenlabs_voice_id", "twilio_fallback_voice",
+    "prompt_handshake_done", "prompt_q_idx", "repeat_reply_count", "last_prompt_reply",
+    "awaiting_final_questions", "handoff_requested", "handoff_now", "handoff_room", "error",
+    "context_brief", "voicemail_left",
+)
+_FIELD_SET = frozenset(FIELDS)
+
+
+class TextPool:
+    """One shared copy of each long text (job descriptions), keyed by job_id or content hash."""
+
+    def __init__(self):
+        self._texts: dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def intern(self, text, key: str = ""):
+        if not isinstance(text, str) or not text:
+            return text
+        k = f"job:{key}" if key else "sha1:" + hashlib.sha1(text.encode("utf-8")).hexdigest()
+        with self._lock:
+            cur = self._texts.get(k)
+            if cur == text:
+                return cur
+            # New job, or the job's description was edited: later sessions share the new text.
+            self._texts[k] = text
+            return text
+
+    def prune(self, live: set[int]) -> int:
+        """Drop pooled texts no live record references (``live`` holds ``id()``s of texts in use)."""
+        with self._lock:
+            dead = [k for k, v in self._texts.items() if id(v) not in live]
+            for k in dead:
+                self._texts.pop(k, None)
+            return len(dead)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"texts": len(self._texts), "bytes": sum(sys.getsizeof(v) for v in self._texts.values())}
+
+
+TEXT_POOL = TextPool()
+
+
+class SessionRecord(MutableMapping):
+    __slots__ = FIELDS + ("_extra",)
+
+    def __init__(self, values: Mapping | None = None):
+        self._extra = None
+        if values:
+            # job_id first so the job description interns under it.
+            if "job_id" in values:
+                self["job_id"] = values["job_id"]
+            for k, v in values.items():
+                self[k] = v
+
+    @classmethod
+    def from_mapping(cls, values) -> "SessionRecord":
+        return values if isinstance(values, cls) else cls(values)
+
+    def __getitem__(self, key):
+        if key in _FIELD_SET:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self._extra is None:
+            raise KeyError(key)
+        return self._extra[key]
+
+    def __setitem__(self, key, value) -> None:
+        if key in _FIELD_SET:
+            if key == "job_description":
+                value = TEXT_POOL.intern(value, str(getattr(self, "job_id", "") or ""))
+            setattr(self, key, value)
+            return
+        if self._extra is None:
+            self._extra = {}
+        self._extra[key] = value
+
+    def __delitem__(self, key) -> None:
+        if key in _FIELD_SET:
+            try:
+                delattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+            return
+        if self._extra is None:
+            raise KeyError(key)
+        del self._extra[key]
+
+    def __contains__(self, key) -> bool:
+        if key in _FIELD_SET:
+            return hasattr(self, key)
+        return self._extra is not None and key in self._extra
+
+    def __iter__(self):
+        for k in FIELDS:
+            if hasattr(self, k):
+                yield k
+        if self._extra:
+            yield from list(self._extra)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __bool__(self) -> bool:
+        # A session is truthy even before any field is set (``INTERVIEW_SESSIONS.get(sid) or {}``).
+        return True
+
+    def __repr__(self) -> str:
+        return f"SessionRecord({self.to_dict()!r})"
+
+    def to_dict(self) -> dict:
+        return {k: self[k] for k in self}
+
+
+def json_default(obj):
+    """``json.dumps(default=...)`` hook that serializes records as plain dicts."""
+    to_dict = getattr(obj, "to_dict", None)
+    return to_dict() if callable(to_dict) else str(obj)
+
+
+def deep_sizeof(obj, seen: set[int] | None = None) -> int:
+    """Approximate retained size of ``obj`` in bytes; shared objects count once per ``seen`` set."""
+    seen = set() if seen is None else seen
+    stack = [obj]
+    total = 0
+    while stack:
+        o = stack.pop()
+        oid = id(o)
+        if oid in seen:
+            continue
+        seen.add(oid)
+        total += sys.getsizeof(o)
+        if isinstance(o, SessionRecord):
+            stack.extend(o[k] for k in o)
+        elif isinstance(o, dict):
+            stack.extend(o.keys())
+            stack.extend(o.values())
+        elif isinstance(o, (list, tuple, set, frozenset)):
+            stack.extend(o)
+    return total
@@ -0,0 +1,554 @@
+"""Pluggable storage for per-call and per-user state.
+
+Interview sessions, conversation state, provider tracking, question history,
+login throttling and password-reset codes used to be plain module-level dicts,
+which pins the app to one worker process and drops live calls on restart.
+``SessionMap`` keeps the dict interface the handlers already use and puts one
+of three backends behind it:
+
+* ``MemorySessionStore`` -- the old behaviour; values are live objects.
+* ``PostgresSessionStore`` -- one JSONB row per key with a version column.
+* ``RedisSessionStore`` -- one hash per key (value + version) on any server
+  that speaks the Redis protocol (Redis, Valkey, KeyDB, a local stand-in).
+
+Handlers mutate values in place (``s["completed"] = True``), so remote
+backends work per ``session_scope()``: the first read of a key in a scope loads
+it, later reads return the same object, and leaving the scope (or
+``flush_sessions()``) writes back whatever changed. Writes are optimistic: a
+save only lands if the stored version is the one that was read. On a conflict
+the fields this scope changed are re-applied on top of the newer value, so two
+workers touching different fields of the same session both win.
+
+Outside a scope, reads return a fresh copy and assignments write through;
+in-place changes to a value read outside a scope are not persisted.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import json
+import threading
+import time
+from collections.abc import MutableMapping
+from contextvars import ContextVar
+from typing import Any, Callable, Iterator
+
+from app.session_record import json_default
+
+try:
+    import redis
+except Exception:
+    redis = None
+
+_MISSING = object()
+
+
+class VersionConflict(Exception):
+    """The stored value changed since it was read."""
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), default=json_default)
+
+
+class MemorySessionStore:
+    """Process-local store. ``SessionMap`` hands out the live objects directly."""
+
+    name = "memory"
+    live = True
+
+    def __init__(self):
+        self._data: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def namespace(self, namespace: str) -> dict:
+        with self._lock:
+            return self._data.setdefault(namespace, {})
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"backend": self.name, "keys": {ns: len(d) for ns, d in self._data.items()}}
+
+    def close(self) -> None:
+        pass
+
+
+class PostgresSessionStore:
+    """One row per (namespace, key) in ``public.screening_session_state``."""
+
+    name = "postgres"
+    live = False
+
+    SCHEMA = """
+    create table if not exists public.screening_session_state (
+      namespace text not null,
+      key text not null,
+      value jsonb not null,
+      version bigint not null default 1,
+      updated_at timestamptz not null default now(),
+      primary key (namespace, key)
+    );
+    """
+
+    def __init__(self, connect: Callable[[], Any]):
+        # ``connect`` returns a pooled connection (or None when the DB is unreachable).
+        self._connect = connect
+
+    def _run(self, sql: str, params: tuple, fetch: str = "one"):
+        conn = self._connect()
+        if conn is None:
+            raise ConnectionError("session store database unavailable")
+        try:
+            with conn:
+                with conn.cursor() as cur:
+                    cur.execute(sql, params)
+                    if fetch == "one":
+                        return cur.fetchone()
+                    if fetch == "all":
+                        return cur.fetchall()
+                    return None
+        finally:
+            conn.close()
+
+    def ensure_schema(self) -> None:
+        self._run(self.SCHEMA, (), fetch="none")
+
+    def load(self, namespace: str, key: str) -> tuple[Any, int]:
+        row = self._run(
+            "select value::text, version from public.screening_session_state where namespace=%s and key=%s",
+            (namespace, key),
+        )
+        if not row:
+            return _MISSING, 0
+        return json.loads(row[0]), int(row[1])
+
+    def save(self, namespace: str, key: str, payload: str, expected_version: int | None) -> int:
+        """Store ``payload`` (JSON text). ``expected_version=None`` overwrites unconditionally."""
+        if expected_version is None:
+            row = self._run(
+                """
+                insert into public.screening_session_state as t (namespace, key, value, version, updated_at)
+                values (%s,%s,%s::jsonb,1,now())
+                on conflict (namespace, key) do update set
+                  value=excluded.value, version=t.version + 1, updated_at=now()
+                returning version
+                """,
+                (namespace, key, payload),
+            )
+        elif expected_version == 0:
+            row = self._run(
+                """
+                insert into public.screening_session_state (namespace, key, value, version, updated_at)
+                values (%s,%s,%s::jsonb,1,now())
+                on conflict (namespace, key) do nothing
+                returning version
+                """,
+                (namespace, key, payload),
+            )
+        else:
+            row = self._run(
+                """
+                update public.screening_session_state
+                   set value=%s::jsonb, version=version + 1, updated_at=now()
+                 where namespace=%s and key=%s and version=%s
+                returning version
+                """,
+                (payload, namespace, key, expected_version),
+            )
+        if not row:
+            raise VersionConflict(f"{namespace}/{key}")
+        return int(row[0])
+
+    def delete(self, namespace: str, key: str) -> None:
+        self._run("delete from public.screening_session_state where namespace=%s and key=%s", (namespace, key), fetch="none")
+
+    def keys(self, namespace: str) -> list[str]:
+        rows = self._run("select key from public.screening_session_state where namespace=%s order by updated_at", (namespace,), fetch="all")
+        return [r[0] for r in rows or []]
+
+    def stats(self) -> dict:
+        try:
+            rows = self._run("select namespace, count(*) from public.screening_session_state group by namespace", (), fetch="all")
+            return {"backend": self.name, "keys": {r[0]: int(r[1]) for r in rows or []}}
+        except Exception as e:
+            return {"backend": self.name, "error": str(e)}
+
+    def close(self) -> None:
+        pass
+
+
+class RedisSessionStore:
+    """One hash per key (``value``, ``version``) on a Redis-protocol server."""
+
+    name = "redis"
+    live = False
+
+    def __init__(self, url: str, prefix: str = "joblynk:", ttl_seconds: int = 0, client=None):
+        if client is None:
+            if redis is None:
+                raise RuntimeError("SESSION_STORE_BACKEND=redis requires the redis package")
+            client = redis.Redis.from_url(url, decode_responses=True)
+        self._r = client
+        self._prefix = prefix
+        self._ttl = int(ttl_seconds or 0)
+
+    def _key(self, namespace: str, key: str) -> str:
+        return f"{self._prefix}{namespace}:{key}"
+
+    def load(self, namespace: str, key: str) -> tuple[Any, int]:
+        value, version = self._r.hmget(self._key(namespace, key), ["value", "version"])
+        if value is None:
+            return _MISSING, 0
+        return json.loads(value), int(version or 0)
+
+    def save(self, namespace: str, key: str, payload: str, expected_version: int | None) -> int:
+        k = self._key(namespace, key)
+        with self._r.pipeline() as pipe:
+            try:
+                pipe.watch(k)
+                current = int(pipe.hget(k, "version") or 0)
+                if expected_version is not None and current != expected_version:
+                    raise VersionConflict(f"{namespace}/{key}")
+                pipe.multi()
+                pipe.hset(k, mapping={"value": payload, "version": current + 1})
+                if self._ttl:
+                    pipe.expire(k, self._ttl)
+                pipe.execute()
+            except Exception as e:
+                if redis is not None and isinstance(e, redis.WatchError):
+                    raise VersionConflict(f"{namespace}/{key}") from e
+                raise
+        return current + 1
+
+    def delete(self, namespace: str, key: str) -> None:
+        self._r.delete(self._key(namespace, key))
+
+    def keys(self, namespace: str) -> list[str]:
+        head = len(self._key(namespace, ""))
+        return [k[head:] for k in self._r.scan_iter(match=self._key(namespace, "*"), count=500)]
+
+    def stats(self) -> dict:
+        return {"backend": self.name, "prefix": self._prefix}
+
+    def close(self) -> None:
+        try:
+            self._r.close()
+        except Exception:
+            pass
+
+
+class _Entry:
+    __slots__ = ("smap", "key", "value", "version", "base", "overwrite", "deleted")
+
+    def __init__(self, smap: "SessionMap", key: str, value: Any, version: int, base: str | None, overwrite: bool = False):
+        self.smap = smap
+        self.key = key
+        self.value = value
+        self.version = version
+        self.base = base  # JSON as read; None for values assigned in this scope
+        self.overwrite = overwrite
+        self.deleted = False
+
+
+class SessionScope:
+    """Values read or written through any ``SessionMap`` during one request or background job."""
+
+    def __init__(self, log: Callable[[str], None] | None = None, max_retries: int = 5):
+        self._entries: dict[tuple[int, str], _Entry] = {}
+        self._lock = threading.RLock()
+        self._log = log or (lambda _msg: None)
+        self.max_retries = max_retries
+
+    def lookup(self, smap: "SessionMap", key: str) -> _Entry | None:
+        return self._entries.get((id(smap), key))
+
+    def remember(self, entry: _Entry) -> None:
+        self._entries[(id(entry.smap), entry.key)] = entry
+
+    def flush(self) -> None:
+        """Write back every changed value; the scope stays usable afterwards."""
+        with self._lock:
+            for entry in list(self._entries.values()):
+                try:
+                    self._flush_entry(entry)
+                except Exception as e:
+                    self._log(f"SESSION_STORE_FLUSH_FAIL ns={entry.smap.namespace} key={entry.key} | {e}")
+
+    def _flush_entry(self, entry: _Entry) -> None:
+        store = entry.smap.store
+        ns = entry.smap.namespace
+        if entry.deleted:
+            store.delete(ns, entry.key)
+            self._entries.pop((id(entry.smap), entry.key), None)
+            return
+        payload = _dumps(entry.value)
+        if payload == entry.base:
+            return
+        if entry.overwrite:
+            entry.version = store.save(ns, entry.key, payload, None)
+            entry.base, entry.overwrite = payload, False
+            return
+        for _ in range(self.max_retries):
+            try:
+                entry.version = store.save(ns, entry.key, payload, entry.version)
+                entry.base = payload
+                return
+            except VersionConflict:
+                payload = self._rebase(entry)
+                if payload is None:
+                    return
+        raise VersionConflict(f"{ns}/{entry.key} after {self.max_retries} retries")
+
+    def _rebase(self, entry: _Entry) -> str | None:
+        """Re-apply this scope's changes on top of the newer stored value; return the merged payload."""
+        current, version = entry.smap.store.load(entry.smap.namespace, entry.key)
+        base = json.loads(entry.base) if entry.base else None
+        ours = entry.value
+        if isinstance(ours, dict) and isinstance(base, dict) and isinstance(current, dict):
+            merged = dict(current)
+            for k in set(base) | set(ours):
+                if k not in ours:
+                    merged.pop(k, None)
+                elif k not in base or _dumps(ours[k]) != _dumps(base[k]):
+                    merged[k] = ours[k]
+            # Keep the caller's object identity; it may still be referenced by the handler.
+            ours.clear()
+            ours.update(merged)
+        elif current is _MISSING and base is not None:
+            # Deleted elsewhere since we read it: the delete wins.
+            self._entries.pop((id(entry.smap), entry.key), None)
+            return None
+        self._log(f"SESSION_STORE_CONFLICT ns={entry.smap.namespace} key={entry.key} version={version}")
+        entry.version = version
+        entry.base = _dumps(current) if current is not _MISSING else None
+        return _dumps(ours)
+
+
+_CURRENT_SCOPE: ContextVar[SessionScope | None] = ContextVar("session_scope", default=None)
+
+
+def current_session_scope() -> SessionScope | None:
+    return _CURRENT_SCOPE.get()
+
+
+@contextlib.contextmanager
+def session_scope(log: Callable[[str], None] | None = None) -> Iterator[SessionScope]:
+    """Open a scope (or join the active one) and flush it on exit. Also usable as a decorator."""
+    outer = _CURRENT_SCOPE.get()
+    if outer is not None:
+        yield outer
+        return
+    scope = SessionScope(log=log)
+    token = _CURRENT_SCOPE.set(scope)
+    try:
+        yield scope
+    finally:
+        _CURRENT_SCOPE.reset(token)
+        scope.flush()
+
+
+def flush_sessions() -> None:
+    """Persist changes made so far in the active scope (long-running jobs call this at checkpoints)."""
+    scope = _CURRENT_SCOPE.get()
+    if scope is not None:
+        scope.flush()
+
+
+class SessionMap(MutableMapping):
+    """Dict-shaped view of one namespace in a session store.
+
+    With the memory backend, ``wrap`` converts assigned values to their compact
+    in-memory type and last-access times are tracked for ``idle_keys``. A key
+    missing from memory is passed to ``load`` (if given) before the lookup
+    misses, so values a sweeper evicted come back on their next read.
+    """
+
+    def __init__(self, store, namespace: str, wrap: Callable[[Any], Any] | None = None, load: Callable[[str], Any] | None = None):
+        self.store = store
+        self.namespace = namespace
+        self._live = store.namespace(namespace) if getattr(store, "live", False) else None
+        self._wrap = wrap
+        self._load = load
+        self._touched: dict[str, float] = {}
+
+    def peek(self, key: str, default=None):
+        """``get`` without counting as an access (for sweepers and gauges)."""
+        if self._live is not None:
+            return self._live.get(key, default)
+        return self.get(key, default)
+
+    def idle_keys(self, idle_seconds: float) -> list[str]:
+        """Keys not read or written for ``idle_seconds`` (memory backend only)."""
+        if self._live is None:
+            return []
+        now = time.monotonic()
+        out = []
+        for key in list(self._live):
+            seen = self._touched.setdefault(key, now)
+            if now - seen >= idle_seconds:
+                out.append(key)
+        return out
+
+    def read(self, key: str, default=None):
+        """The stored value right now, bypassing the session scope (for state polled across workers)."""
+        if self._live is not None:
+            return self._live.get(key, default)
+        value, _version = self.store.load(self.namespace, key)
+        return default if value is _MISSING else value
+
+    def write(self, key: str, value) -> None:
+        """Store ``value`` immediately rather than when the session scope flushes."""
+        if self._live is not None:
+            self._live[key] = value
+            return
+        self.store.save(self.namespace, key, _dumps(value), None)
+
+    def remove(self, key: str) -> None:
+        """Delete ``key`` immediately, outside any session scope."""
+        if self._live is not None:
+            self._live.pop(key, None)
+            return
+        self.store.delete(self.namespace, key)
+
+    def _reload(self, key: str):
+        """Memory backend miss: the value ``load`` returns (kept in memory), else ``_MISSING``."""
+        if self._load is None or not key:
+            return _MISSING
+        value = self._load(key)
+        if value is None:
+            return _MISSING
+        if self._wrap is not None:
+            value = self._wrap(value)
+        # A concurrent reload or write of the same key wins; everyone shares one object.
+        value = self._live.setdefault(key, value)
+        self._touched[key] = time.monotonic()
+        return value
+
+    def _entry(self, key: str) -> _Entry | None:
+        scope = _CURRENT_SCOPE.get()
+        if scope is not None:
+            entry = scope.lookup(self, key)
+            if entry is not None:
+                return None if entry.deleted else entry
+        value, version = self.store.load(self.namespace, key)
+        if value is _MISSING:
+            return None
+        entry = _Entry(self, key, value, version, _dumps(value))
+        if scope is not None:
+            scope.remember(entry)
+        return entry
+
+    def __getitem__(self, key: str):
+        if self._live is not None:
+            value = self._live.get(key, _MISSING)
+            if value is _MISSING:
+                value = self._reload(key)
+                if value is _MISSING:
+                    raise KeyError(key)
+            self._touched[key] = time.monotonic()
+            return value
+        entry = self._entry(key)
+        if entry is None:
+            raise KeyError(key)
+        return entry.value
+
+    def get(self, key: str, default=None):
+        if self._live is not None:
+            value = self._live.get(key, _MISSING)
+            if value is _MISSING:
+                value = self._reload(key)
+                if value is _MISSING:
+                    return default
+            self._touched[key] = time.monotonic()
+            return value
+        entry = self._entry(key)
+        return default if entry is None else entry.value
+
+    def __contains__(self, key) -> bool:
+        if self._live is not None:
+            return key in self._live or self._reload(key) is not _MISSING
+        return self._entry(key) is not None
+
+    def __setitem__(self, key: str, value) -> None:
+        if self._live is not None:
+            self._live[key] = self._wrap(value) if self._wrap is not None else value
+            self._touched[key] = time.monotonic()
+            return
+        scope = _CURRENT_SCOPE.get()
+        if scope is None:
+            self.store.save(self.namespace, key, _dumps(value), None)
+            return
+        existing = scope.lookup(self, key)
+        if existing is not None and not existing.deleted:
+            # Re-assigning the object that was read (``X[k] = s``) keeps the merge-on-conflict path.
+            if existing.value is not value:
+                existing.value = value
+                existing.overwrite = True
+            return
+        scope.remember(_Entry(self, key, value, 0, None, overwrite=True))
+
+    def __delitem__(self, key: str) -> None:
+        if self._live is not None:
+            del self._live[key]
+            self._touched.pop(key, None)
+            return
+        if key not in self:
+            raise KeyError(key)
+        scope = _CURRENT_SCOPE.get()
+        if scope is None:
+            self.store.delete(self.namespace, key)
+            return
+        scope.lookup(self, key).deleted = True
+
+    def pop(self, key: str, default=_MISSING):
+        if self._live is not None:
+            self._touched.pop(key, None)
+            return self._live.pop(key) if default is _MISSING else self._live.pop(key, default)
+        return super().pop(key) if default is _MISSING else super().pop(key, default)
+
+    def __iter__(self):
+        if self._live is not None:
+            return iter(list(self._live))
+        keys = self.store.keys(self.namespace)
+        scope = _CURRENT_SCOPE.get()
+        if scope is not None:
+            # Keys created in this scope are not in the store until it flushes.
+            pending = [e.key for e in scope._entries.values() if e.smap is self and not e.deleted and e.key not in keys]
+            keys = keys + pending
+        return iter(keys)
+
+    def __len__(self) -> int:
+        if self._live is not None:
+            return len(self._live)
+        return len(self.store.keys(self.namespace))
+
+    def items(self):
+        if self._live is not None:
+            return list(self._live.items())
+        out = []
+        for key in list(self):
+            entry = self._entry(key)
+            if entry is not None:
+                out.append((key, entry.value))
+        return out
+
+    def values(self):
+        return [v for _, v in self.items()]
+
+
+def build_session_store(backend: str, *, connect=None, redis_url: str = "", prefix: str = "joblynk:", ttl_seconds: int = 0, log: Callable[[str], None] | None = None):
+    """Create the configured backend, falling back to memory (with a log line) if it cannot start."""
+    log = log or (lambda _msg: None)
+    backend = (backend or "memory").strip().lower()
+    try:
+        if backend == "postgres":
+            if connect is None:
+                raise RuntimeError("postgres backend needs a connection factory")
+            return PostgresSessionStore(connect)
+        if backend == "redis":
+            store = RedisSessionStore(redis_url, prefix=prefix, ttl_seconds=ttl_seconds)
+            store._r.ping()
+            return store
+    except Exception as e:
+        log(f"SESSION_STORE_INIT_FAIL backend={backend} | {e} | falling back to memory")
+    return MemorySessionStore()
@@ -0,0 +1,243 @@
+"""Write-behind snapshots of interview sessions.
+
+A restart used to lose every in-flight interview: the callback path rebuilt a
+session from ``screening_sessions``, re-parsed the resume from disk and asked
+the LLM for a fresh question plan while the caller waited on the webhook.
+``SnapshotWriter`` keeps a durable copy instead. Handlers call ``mark()`` after
+each turn (cheap: it only records the session reference); a background thread
+serializes the latest state of every marked session and upserts the batch into
+``public.screening_session_snapshots`` every ``interval_seconds``. Repeated
+marks of the same session between flushes coalesce into one write.
+
+Rehydration is one indexed read (``load`` / ``load_for_candidate``) with no
+LLM call or file parsing. Each row also carries a small ``summary`` (the
+``summary_fields`` the dashboard lists), so ``load_all`` never reads the full
+snapshots with their resume, job description and dialogue.
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from collections.abc import Mapping
+from typing import Any, Callable
+
+SCHEMA = """
+create table if not exists public.screening_session_snapshots (
+  session_id text primary key,
+  candidate_id text,
+  snapshot jsonb not null,
+  summary jsonb,
+  updated_at timestamptz not null default now()
+);
+alter table public.screening_session_snapshots add column if not exists summary jsonb;
+create index if not exists idx_screening_session_snapshots_updated
+  on public.screening_session_snapshots(updated_at desc);
+create index if not exists idx_screening_session_snapshots_candidate
+  on public.screening_session_snapshots(candidate_id, updated_at desc);
+"""
+
+_UPSERT = """
+insert into public.screening_session_snapshots (session_id, candidate_id, snapshot, summary, updated_at)
+values (%s,%s,%s::jsonb,%s::jsonb,now())
+on conflict (session_id) do update set
+  candidate_id=coalesce(excluded.candidate_id, public.screening_session_snapshots.candidate_id),
+  snapshot=excluded.snapshot,
+  summary=excluded.summary,
+  updated_at=now()
+"""
+
+
+class SnapshotWriter:
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        interval_seconds: float = 0.25,
+        log: Callable[[str], None] | None = None,
+        enabled: bool = True,
+        summary_fields: tuple[str, ...] = (),
+    ):
+        # ``connect`` returns a pooled connection (or None when the DB is unreachable).
+        self._connect = connect
+        self.interval_seconds = max(0.01, float(interval_seconds))
+        self._log = log or (lambda _msg: None)
+        self.enabled = enabled
+        self.summary_fields = tuple(summary_fields)
+        self._pending: dict[str, Mapping] = {}
+        self._cond = threading.Condition()
+        self._thread: threading.Thread | None = None
+        self._stopped = False
+        self._metrics = {"marked": 0, "written": 0, "batches": 0, "failed": 0, "last_flush_ms": 0.0, "restored": 0}
+
+    # -- producer side ----------------------------------------------------------
+
+    def mark(self, session_id: str, session: dict | None) -> None:
+        """Schedule ``session`` to be snapshotted; the newest mark before a flush wins."""
+        if not self.enabled or not session_id or not isinstance(session, Mapping):
+            return
+        with self._cond:
+            self._pending[session_id] = session
+            self._metrics["marked"] += 1
+            if self._thread is None and not self._stopped:
+                self._thread = threading.Thread(target=self._run, name="session-snapshots", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def flush(self) -> int:
+        """Write everything pending now, on the calling thread. Returns rows written."""
+        with self._cond:
+            pending, self._pending = self._pending, {}
+        return self._write(pending)
+
+    def write_now(self, session_id: str, session: Mapping) -> bool:
+        """Synchronously persist one session (used before evicting it from memory)."""
+        with self._cond:
+            self._pending.pop(session_id, None)
+        return self._write({session_id: session}) == 1
+
+    def close(self) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        self.flush()
+
+    # -- reads ------------------------------------------------------------------
+
+    def load(self, session_id: str) -> dict | None:
+        row = self._fetch("select snapshot::text from public.screening_session_snapshots where session_id=%s", (session_id,))
+        return self._decode(row[0]) if row else None
+
+    def load_for_candidate(self, candidate_id: str, preferred_session_id: str = "") -> tuple[str, dict] | None:
+        """Latest snapshot for a candidate, preferring ``preferred_session_id`` when it has one."""
+        row = self._fetch(
+            """
+            select session_id, snapshot::text
+            from public.screening_session_snapshots
+            where candidate_id=%s
+            order by (session_id=%s) desc, updated_at desc
+            limit 1
+            """,
+            (candidate_id, preferred_session_id or ""),
+        )
+        if not row:
+            return None
+        snap = self._decode(row[1])
+        return (row[0], snap) if snap is not None else None
+
+    def load_all(self, exclude=(), limit: int = 1000) -> list[tuple[str, dict]]:
+        """Summaries of the most recent snapshots (newest first) except ``exclude``, for listings of evicted sessions."""
+        rows = self._fetch(
+            """
+            select session_id, summary::text
+            from public.screening_session_snapshots
+            where not (session_id = any(%s)) and summary is not null
+            order by updated_at desc
+            limit %s
+            """,
+            (list(exclude), int(limit)),
+            many=True,
+        )
+        out = []
+        for sid, text in rows or []:
+            snap = self._decode(text)
+            if snap is not None:
+                out.append((sid, snap))
+        return out
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {**self._metrics, "pending": len(self._pending), "enabled": self.enabled}
+
+    def count(self, name: str, n: int = 1) -> None:
+        with self._cond:
+            self._metrics[name] = self._metrics.get(name, 0) + n
+
+    # -- internals --------------------------------------------------------------
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopped:
+                    self._cond.wait()
+                if self._stopped:
+                    return
+            # Let a burst of marks from the same turn coalesce before writing.
+            time.sleep(self.interval_seconds)
+            try:
+                self.flush()
+            except Exception as e:
+                self._log(f"SESSION_SNAPSHOT_FLUSH_FAIL | {e}")
+
+    def _write(self, pending: dict[str, Mapping]) -> int:
+        if not pending:
+            return 0
+        rows = []
+        for session_id, session in pending.items():
+            payload = self._serialize(session)
+            if payload is None:
+                # Mutated mid-serialization; try again next round.
+                with self._cond:
+                    self._pending.setdefault(session_id, session)
+                continue
+            rows.append((session_id, (session.get("candidate_id") or None), payload, self._summary(session)))
+        if not rows:
+            return 0
+
+        started = time.monotonic()
+        conn = self._connect()
+        if conn is None:
+            self.count("failed", len(rows))
+            return 0
+        try:
+            with conn:
+                with conn.cursor() as cur:
+                    cur.executemany(_UPSERT, rows)
+        except Exception as e:
+            self.count("failed", len(rows))
+            self._log(f"SESSION_SNAPSHOT_WRITE_FAIL rows={len(rows)} | {e}")
+            return 0
+        finally:
+            conn.close()
+        with self._cond:
+            self._metrics["written"] += len(rows)
+            self._metrics["batches"] += 1
+            self._metrics["last_flush_ms"] = round((time.monotonic() - started) * 1000.0, 2)
+        return len(rows)
+
+    def _fetch(self, sql: str, params: tuple, many: bool = False):
+        conn = self._connect()
+        if conn is None:
+            return None
+        try:
+            with conn:
+                with conn.cursor() as cur:
+                    cur.execute(sql, params)
+                    return cur.fetchall() if many else cur.fetchone()
+        except Exception as e:
+            self._log(f"SESSION_SNAPSHOT_READ_FAIL | {e}")
+            return None
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _serialize(session: Mapping) -> str | None:
+        try:
+            to_dict = getattr(session, "to_dict", None)
+            return json.dumps(to_dict() if callable(to_dict) else session, default=str)
+        except RuntimeError:
+            return None
+
+    def _summary(self, session: Mapping) -> str:
+        try:
+            return json.dumps({k: session.get(k) for k in self.summary_fields}, default=str)
+        except RuntimeError:
+            return "{}"
+
+    @staticmethod
+    def _decode(text) -> dict | None:
+        try:
+            value = json.loads(text) if isinstance(text, str) else text
+        except Exception:
+            return None
+        return value if isinstance(value, dict) else None
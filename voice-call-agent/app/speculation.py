@@ -0,0 +1,202 @@
+"""Speculative turn replies from partial speech results.
+
+Twilio's ``<Gather partialResultCallback>`` posts the running transcript
+while the caller is still talking. ``SpeculativeTurns`` keeps the latest
+partial per call and, once it has not changed for ``stable_seconds``, runs
+``generate(key, text, context, cancelled)`` on a worker thread: the same
+turn the final webhook would run, against a copy of the session, with TTS
+started for each sentence. When the final ``SpeechResult`` arrives, ``claim`` hands
+back the finished (or nearly finished) result if the final text matches
+what was speculated on; otherwise the speculation is discarded and the turn
+runs normally. A draft that is superseded by a newer partial (or discarded)
+has its ``cancelled`` event set; ``generate`` checks it between sentences and
+raises ``SpeculationCancelled`` so the abandoned draft stops holding LLM and
+TTS capacity.
+
+A speculation never has side effects beyond the LLM/TTS work itself; the
+caller decides what to apply on commit.
+"""
+
+from __future__ import annotations
+
+import heapq
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable
+
+_NON_WORD = re.compile(r"[^a-z0-9']+")
+
+
+class SpeculationCancelled(BaseException):
+    """Raised inside ``generate`` once its draft is abandoned.
+
+    A ``BaseException`` so the turn's own ``except Exception`` fallbacks do not
+    turn it into a reply.
+    """
+
+
+def normalize_transcript(text: str) -> str:
+    return " ".join(_NON_WORD.sub(" ", (text or "").lower().replace("’", "'")).split())
+
+
+class _Partial:
+    __slots__ = ("text", "context", "seq", "updated", "future", "cancelled", "spec_text", "started")
+
+    def __init__(self):
+        self.text = ""
+        self.context: Any = None
+        self.seq = 0
+        self.updated = 0.0
+        self.future: Future | None = None
+        self.cancelled: threading.Event | None = None
+        self.spec_text = ""
+        self.started = 0.0
+
+
+class SpeculativeTurns:
+    def __init__(
+        self,
+        generate: Callable[[str, str, Any, threading.Event], Any],
+        stable_seconds: float = 0.6,
+        min_words: int = 3,
+        max_workers: int = 8,
+        ttl_seconds: float = 60.0,
+        log: Callable[[str], None] | None = None,
+    ):
+        self._generate = generate
+        self.stable_seconds = max(0.05, float(stable_seconds))
+        self.min_words = max(1, int(min_words))
+        self.ttl_seconds = ttl_seconds
+        self._log = log or (lambda _msg: None)
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="speculate")
+        self._cond = threading.Condition()
+        self._partials: dict[str, _Partial] = {}
+        self._due: list[tuple[float, str, int]] = []
+        self._thread: threading.Thread | None = None
+        self._stopped = False
+        self._metrics = {"partials": 0, "started": 0, "superseded": 0, "cancelled": 0, "committed": 0, "mismatched": 0, "late": 0, "failed": 0}
+
+    # -- producer side ----------------------------------------------------------
+
+    def observe(self, key: str, text: str, context: Any = None) -> None:
+        """Record the latest partial transcript for ``key`` (a call sid)."""
+        text = (text or "").strip()
+        if not key or not text:
+            return
+        now = time.monotonic()
+        with self._cond:
+            p = self._partials.get(key)
+            if p is None:
+                p = self._partials[key] = _Partial()
+            self._metrics["partials"] += 1
+            if normalize_transcript(text) == normalize_transcript(p.text):
+                return
+            p.text, p.context, p.updated = text, context, now
+            p.seq += 1
+            heapq.heappush(self._due, (now + self.stable_seconds, key, p.seq))
+            if self._thread is None and not self._stopped:
+                self._thread = threading.Thread(target=self._run, name="speculation-scheduler", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def claim(self, key: str, final_text: str, wait_seconds: float) -> Any | None:
+        """Result speculated on ``final_text`` (waiting up to ``wait_seconds`` if still running), else None."""
+        with self._cond:
+            p = self._partials.pop(key, None)
+        if p is None or p.future is None:
+            return None
+        if normalize_transcript(final_text) != normalize_transcript(p.spec_text):
+            self.count("mismatched")
+            self._cancel(p)
+            return None
+        try:
+            result = p.future.result(timeout=max(0.0, wait_seconds))
+        except TimeoutError:
+            self.count("late")
+            self._cancel(p)
+            return None
+        except Exception:
+            return None
+        if result is None:
+            return None
+        self.count("committed")
+        self._log(f"SPECULATIVE_REPLY_COMMIT key={key} lead_ms={(time.monotonic() - p.started) * 1000:.0f}")
+        return result
+
+    def discard(self, key: str) -> None:
+        with self._cond:
+            p = self._partials.pop(key, None)
+        if p is not None:
+            self._cancel(p)
+
+    def close(self) -> None:
+        with self._cond:
+            self._stopped = True
+            for p in self._partials.values():
+                self._cancel(p)
+            self._partials.clear()
+            self._cond.notify_all()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {**self._metrics, "tracked_calls": len(self._partials)}
+
+    def count(self, name: str, n: int = 1) -> None:
+        with self._cond:
+            self._metrics[name] = self._metrics.get(name, 0) + n
+
+    # -- internals --------------------------------------------------------------
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._stopped and (not self._due or self._due[0][0] > time.monotonic()):
+                    self._cond.wait(max(0.005, self._due[0][0] - time.monotonic()) if self._due else None)
+                if self._stopped:
+                    return
+                _due, key, seq = heapq.heappop(self._due)
+                p = self._partials.get(key)
+                if p is None or p.seq != seq:
+                    continue  # superseded by a newer partial before it stabilized
+                self._expire_locked()
+                text = p.text
+                if len(normalize_transcript(text).split()) < self.min_words:
+                    continue
+                if p.future is not None and normalize_transcript(p.spec_text) == normalize_transcript(text):
+                    continue
+                if p.future is not None:
+                    self._metrics["superseded"] += 1
+                    self._cancel(p)
+                p.spec_text, p.started = text, time.monotonic()
+                p.cancelled = threading.Event()
+                self._metrics["started"] += 1
+                p.future = self._pool.submit(self._safe_generate, key, text, p.context, p.cancelled)
+
+    @staticmethod
+    def _cancel(p: _Partial) -> None:
+        """Stop ``p``'s draft: drop it if still queued, otherwise signal it to bail out."""
+        if p.cancelled is not None:
+            p.cancelled.set()
+        if p.future is not None:
+            p.future.cancel()
+
+    def _safe_generate(self, key: str, text: str, context: Any, cancelled: threading.Event):
+        if cancelled.is_set():
+            return None
+        try:
+            return self._generate(key, text, context, cancelled)
+        except SpeculationCancelled:
+            self.count("cancelled")
+            return None
+        except Exception as e:
+            self.count("failed")
+            self._log(f"SPECULATIVE_REPLY_FAIL key={key} | {e}")
+            return None
+
+    def _expire_locked(self) -> None:
+        now = time.monotonic()
+        for k in [k for k, p in self._partials.items() if now - p.updated > self.ttl_seconds]:
+            self._partials.pop(k, None)
@@ -0,0 +1,153 @@
+"""Serving files from ``AUDIO_DIR`` to Twilio and the dashboard.
+
+TTS cache files are content-addressed (``tts_<hash>.<ext>``: the name is a
+hash of voice, format and text), so they can be cached by clients forever.
+``audio_response`` adds what Starlette's ``FileResponse`` lacks here: a strong
+ETag with ``If-None-Match`` -> 304, ``Cache-Control: immutable`` for
+content-addressed names, single-range ``Range`` / ``If-Range`` requests
+(206 / 416) for scrubbing previews, and HEAD without a body.
+
+The body goes out through the ASGI ``http.response.zerocopy`` /
+``http.response.pathsend`` extensions when the server offers them, otherwise
+in 64 KiB chunks read off the event loop. With ``accel_prefix`` set the app
+only answers with ``X-Accel-Redirect`` and a front proxy (nginx) sends the
+file itself with ``sendfile``.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from email.utils import formatdate
+from pathlib import Path
+
+import anyio
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+CHUNK_SIZE = 64 * 1024
+
+_RANGE = re.compile(r"^\s*bytes\s*=\s*(\d*)\s*-\s*(\d*)\s*$")
+
+
+def strong_etag(st: os.stat_result) -> str:
+    # A re-render after eviction writes new bytes under the same name, so mtime is part of the tag.
+    return f'"{st.st_size:x}-{st.st_mtime_ns:x}-{st.st_ino:x}"'
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    tags = [t.strip() for t in header.split(",")]
+    return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+
+def parse_range(header: str, size: int) -> tuple[int, int] | None:
+    """(start, end) inclusive for a single ``bytes=`` range, or None to send the whole file.
+
+    Raises ValueError when the range cannot be satisfied. Multi-range requests
+    are answered with the full body, which RFC 9110 allows.
+    """
+    m = _RANGE.match(header or "")
+    if not m:
+        return None
+    first, last = m.group(1), m.group(2)
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)
+        if length == 0:
+            raise ValueError("empty suffix range")
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError("range not satisfiable")
+    return start, end
+
+
+class _FileBody(Response):
+    """The file (or one byte range of it), sent with zero-copy when the server supports it."""
+
+    def __init__(self, path: Path, start: int, end: int, status_code: int, headers: dict, send_body: bool):
+        super().__init__(status_code=status_code, headers=headers)
+        self.path = path
+        self.start = start
+        self.length = end - start + 1
+        self.send_body = send_body
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if not self.send_body or self.length <= 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        extensions = scope.get("extensions") or {}
+        if "http.response.pathsend" in extensions and self.status_code == 200:
+            await send({"type": "http.response.pathsend", "path": str(self.path)})
+            return
+        async with await anyio.open_file(self.path, mode="rb") as f:
+            if "http.response.zerocopy" in extensions:
+                await send({"type": "http.response.zerocopy", "file": f.wrapped, "offset": self.start, "count": self.length, "more_body": False})
+                return
+            await f.seek(self.start)
+            remaining = self.length
+            while remaining > 0:
+                chunk = await f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                # File shrank underneath us; close the response rather than hang the client.
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+def audio_response(
+    request: Request,
+    path: Path,
+    st: os.stat_result,
+    media_type: str,
+    cache_control: str = REVALIDATE,
+    accel_path: str = "",
+) -> Response:
+    """Conditional / ranged response for one file under AUDIO_DIR.
+
+    ``accel_path`` (the proxy-internal URI of the file) switches to
+    ``X-Accel-Redirect``: the proxy then handles Range and sends the bytes.
+    """
+    etag = strong_etag(st)
+    headers = {
+        "etag": etag,
+        "last-modified": formatdate(st.st_mtime, usegmt=True),
+        "cache-control": cache_control,
+        "accept-ranges": "bytes",
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    if accel_path:
+        headers["x-accel-redirect"] = accel_path
+        return Response(status_code=200, headers=headers, media_type=media_type)
+
+    size = st.st_size
+    send_body = request.method != "HEAD"
+    byte_range = None
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range.strip() == etag):
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            headers["content-range"] = f"bytes */{size}"
+            return Response(status_code=416, headers=headers)
+
+    headers["content-type"] = media_type
+    if byte_range is None:
+        headers["content-length"] = str(size)
+        return _FileBody(path, 0, size - 1, 200, headers, send_body)
+    start, end = byte_range
+    headers["content-range"] = f"bytes {start}-{end}/{size}"
+    headers["content-length"] = str(end - start + 1)
+    return _FileBody(path, start, end, 206, headers, send_body)
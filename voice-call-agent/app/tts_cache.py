@@ -0,0 +1,425 @@
+"""Content-addressed store for synthesized TTS audio.
+
+Cache files are named ``tts_<hash>.<ext>`` where the hash covers voice, format
+and text, so a name never changes meaning. ``TTSCache`` keeps an in-memory LRU
+index of what is on disk, so a turn asking "is this line cached?" costs one
+``stat()`` of a known path rather than a directory scan. Files live in two-character shard
+directories (``audio/tts/ab/tts_ab12....wav``) so no single directory grows
+to thousands of entries; the public file name (and ``/audio`` URL) stays flat.
+
+``fill(name, produce)`` is single-flight: concurrent fills of one name in this
+process wait on the first, and an ``flock`` on a per-name lock file does the
+same across worker processes, which then adopt the file the winner wrote.
+Files are written to a temp name and renamed into place, so a reader never
+sees a partial file.
+
+Eviction (count, total bytes, age) runs on a background sweeper, which also
+re-syncs the index with the directory to pick up other processes' fills.
+Only one process deletes files: the one holding the evictor ``flock``. The
+others just drop index entries whose file is gone. Lookups stat an indexed
+file before reporting it cached, so a name is never handed out for a
+``<Play>`` after its file was evicted. Names passed to ``pin`` (the static
+phrase bank) are never evicted.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Callable
+
+try:
+    import fcntl
+except Exception:  # not available on Windows; single-flight is then per process only
+    fcntl = None
+
+_NAME = re.compile(r"^tts_([0-9a-f]{2})[0-9a-f]*\.[a-z0-9]+$")
+_LOCK_SUFFIX = ".lock"
+_EVICTOR_LOCK = ".evictor.lock"
+_STALE_LOCK_SECONDS = 3600
+
+
+def _same_file(fd: int, path: Path) -> bool:
+    """True if ``path`` still names the file open as ``fd``."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    fst = os.fstat(fd)
+    return (st.st_dev, st.st_ino) == (fst.st_dev, fst.st_ino)
+
+
+class TTSCache:
+    def __init__(
+        self,
+        root: Path,
+        max_files: int = 500,
+        max_bytes: int = 0,
+        max_age_seconds: float = 0,
+        sweep_interval_seconds: float = 60.0,
+        rescan_every: int = 10,
+        log: Callable[[str], None] | None = None,
+    ):
+        self.root = Path(root)
+        self.max_files = max(1, int(max_files))
+        self.max_bytes = max(0, int(max_bytes))
+        self.max_age_seconds = max(0.0, float(max_age_seconds))
+        self.sweep_interval_seconds = max(1.0, float(sweep_interval_seconds))
+        self.rescan_every = max(1, int(rescan_every))
+        self._log = log or (lambda _msg: None)
+        self._lock = threading.Lock()
+        # name -> (size, mtime); order is least- to most-recently used.
+        self._index: OrderedDict[str, tuple[int, float]] = OrderedDict()
+        self._bytes = 0
+        self._inflight: dict[str, Future] = {}
+        self._pinned: frozenset[str] = frozenset()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._evictor_fd: int | None = None
+        self._metrics = {
+            "hits": 0,
+            "misses": 0,
+            "fills": 0,
+            "fill_waits": 0,
+            "fill_adopted": 0,
+            "fill_failed": 0,
+            "evicted": 0,
+            "stale_entries": 0,
+        }
+
+    # -- lookups ----------------------------------------------------------------
+
+    @staticmethod
+    def owns(name: str) -> bool:
+        return bool(_NAME.match(name or ""))
+
+    def path(self, name: str) -> Path:
+        m = _NAME.match(name)
+        if not m:
+            raise ValueError(f"not a TTS cache name: {name!r}")
+        return self.root / m.group(1) / name
+
+    def contains(self, name: str) -> bool:
+        """True if ``name`` is cached; counts a hit or miss and refreshes its LRU position."""
+        if self._indexed(name):
+            with self._lock:
+                if name in self._index:
+                    self._index.move_to_end(name)
+                self._metrics["hits"] += 1
+            return True
+        # Not indexed here; another worker process may have written it since the last rescan.
+        if self._adopt(name):
+            with self._lock:
+                self._metrics["hits"] += 1
+            return True
+        with self._lock:
+            self._metrics["misses"] += 1
+        return False
+
+    def peek(self, name: str) -> bool:
+        """Like ``contains`` but without touching hit/miss counters or LRU order."""
+        return self._indexed(name) or self._adopt(name)
+
+    def pin(self, names) -> None:
+        """Replace the set of names eviction must keep (files need not exist yet)."""
+        with self._lock:
+            self._pinned = frozenset(names)
+
+    def forget(self, name: str) -> None:
+        """Drop an index entry whose file turned out to be missing."""
+        with self._lock:
+            entry = self._index.pop(name, None)
+            if entry:
+                self._bytes -= entry[0]
+
+    # -- fills ------------------------------------------------------------------
+
+    def fill(self, name: str, produce: Callable[[], bytes]) -> Path:
+        """Return the cached file for ``name``, calling ``produce()`` once if it is missing."""
+        path = self.path(name)
+        indexed = self._indexed(name)
+        with self._lock:
+            if indexed and name in self._index:
+                self._index.move_to_end(name)
+                return path
+            fut = self._inflight.get(name)
+            owner = fut is None
+            if owner:
+                fut = self._inflight[name] = Future()
+            else:
+                self._metrics["fill_waits"] += 1
+        if not owner:
+            return fut.result()
+        try:
+            self._fill_locked(name, path, produce)
+            fut.set_result(path)
+            return path
+        except BaseException as e:
+            with self._lock:
+                self._metrics["fill_failed"] += 1
+            fut.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(name, None)
+
+    def _fill_locked(self, name: str, path: Path, produce: Callable[[], bytes]) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        lock_fd = self._acquire_file_lock(path)
+        try:
+            # Another process may have filled it while we waited for the lock.
+            if self._adopt(name):
+                with self._lock:
+                    self._metrics["fill_adopted"] += 1
+                return
+            data = produce()
+            if not data:
+                raise ValueError(f"empty audio for {name}")
+            tmp = path.with_name(f".{name}.{uuid.uuid4().hex[:8]}.tmp")
+            try:
+                with open(tmp, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, path)
+            finally:
+                if tmp.exists():
+                    tmp.unlink(missing_ok=True)
+            self._add(name, len(data), time.time())
+            with self._lock:
+                self._metrics["fills"] += 1
+        finally:
+            self._release_file_lock(lock_fd)
+
+    def _acquire_file_lock(self, path: Path):
+        if fcntl is None:
+            return None
+        lock_path = path.with_name(f".{path.name}{_LOCK_SUFFIX}")
+        while True:
+            fd = os.open(lock_path, os.O_CREAT | os.O_RDWR, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            except Exception:
+                os.close(fd)
+                raise
+            # The lock sweeper may have unlinked the file while we waited; a lock on an
+            # orphaned inode excludes nobody, so retry on the file now at that path.
+            if _same_file(fd, lock_path):
+                return fd
+            os.close(fd)
+
+    @staticmethod
+    def _release_file_lock(fd) -> None:
+        if fd is None:
+            return
+        try:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+    # -- index ------------------------------------------------------------------
+
+    def _indexed(self, name: str) -> bool:
+        """``name`` is in the index and its file is still on disk (dropping the entry if not)."""
+        with self._lock:
+            if name not in self._index:
+                return False
+        try:
+            if self.path(name).stat().st_size > 0:
+                return True
+        except OSError:
+            pass
+        # Evicted by another worker (or removed by hand) since we indexed it.
+        with self._lock:
+            entry = self._index.pop(name, None)
+            if entry:
+                self._bytes -= entry[0]
+                self._metrics["stale_entries"] += 1
+        return False
+
+    def _adopt(self, name: str) -> bool:
+        try:
+            st = self.path(name).stat()
+        except (OSError, ValueError):
+            return False
+        if st.st_size <= 0:
+            return False
+        self._add(name, st.st_size, st.st_mtime)
+        return True
+
+    def _add(self, name: str, size: int, mtime: float) -> None:
+        with self._lock:
+            old = self._index.pop(name, None)
+            if old:
+                self._bytes -= old[0]
+            self._index[name] = (size, mtime)
+            self._bytes += size
+
+    def scan(self, legacy_dir: Path | None = None) -> int:
+        """Rebuild the index from disk, moving flat ``legacy_dir/tts_*`` files into their shards."""
+        if legacy_dir is not None:
+            moved = 0
+            for p in Path(legacy_dir).glob("tts_*.*"):
+                if p.is_file() and self.owns(p.name):
+                    try:
+                        dest = self.path(p.name)
+                        dest.parent.mkdir(parents=True, exist_ok=True)
+                        os.replace(p, dest)
+                        moved += 1
+                    except OSError:
+                        pass
+            if moved:
+                self._log(f"TTS_CACHE_MIGRATED files={moved}")
+        found: list[tuple[float, str, int]] = []
+        if self.root.is_dir():
+            for shard in self.root.iterdir():
+                if not shard.is_dir():
+                    continue
+                for p in shard.iterdir():
+                    if not self.owns(p.name):
+                        continue
+                    try:
+                        st = p.stat()
+                    except OSError:
+                        continue
+                    if st.st_size > 0:
+                        found.append((st.st_mtime, p.name, st.st_size))
+        found.sort()
+        with self._lock:
+            recent = {k: i for i, k in enumerate(self._index)}
+            index: OrderedDict[str, tuple[int, float]] = OrderedDict()
+            # Files this process has used keep their LRU order; the rest go in mtime order before them.
+            for mtime, name, size in found:
+                if name not in recent:
+                    index[name] = (size, mtime)
+            for mtime, name, size in sorted((x for x in found if x[1] in recent), key=lambda x: recent[x[1]]):
+                index[name] = (size, mtime)
+            self._index = index
+            self._bytes = sum(size for size, _ in index.values())
+            return len(index)
+
+    # -- eviction ---------------------------------------------------------------
+
+    def sweep(self) -> int:
+        """Evict expired entries, then least-recently-used ones until under the count/byte limits.
+
+        Only the evictor process deletes files; other processes drop index entries whose file is gone.
+        """
+        now = time.time()
+        if not self._is_evictor():
+            with self._lock:
+                names = list(self._index)
+            for name in names:
+                self._indexed(name)
+            return 0
+        victims: list[str] = []
+        with self._lock:
+            if self.max_age_seconds:
+                for name, (_size, mtime) in list(self._index.items()):
+                    if now - mtime > self.max_age_seconds and name not in self._inflight and name not in self._pinned:
+                        victims.append(name)
+            for name in victims:
+                self._bytes -= self._index.pop(name)[0]
+            for name in list(self._index):
+                if len(self._index) <= self.max_files and (not self.max_bytes or self._bytes <= self.max_bytes):
+                    break
+                if name in self._inflight or name in self._pinned:
+                    continue
+                self._bytes -= self._index.pop(name)[0]
+                victims.append(name)
+            self._metrics["evicted"] += len(victims)
+        for name in victims:
+            try:
+                self.path(name).unlink(missing_ok=True)
+            except OSError:
+                pass
+        self._sweep_locks(now)
+        if victims:
+            self._log(f"TTS_CACHE_EVICTED files={len(victims)}")
+        return len(victims)
+
+    def _sweep_locks(self, now: float) -> None:
+        if fcntl is None or not self.root.is_dir():
+            return
+        for lock in self.root.glob(f"*/.*{_LOCK_SUFFIX}"):
+            try:
+                if now - lock.stat().st_mtime < _STALE_LOCK_SECONDS:
+                    continue
+                fd = os.open(lock, os.O_RDWR)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    # Only unlink the file we hold the lock on; it may have been replaced since we opened it.
+                    if _same_file(fd, lock):
+                        lock.unlink(missing_ok=True)
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                finally:
+                    os.close(fd)
+            except OSError:
+                continue
+
+    def _is_evictor(self) -> bool:
+        """True if this process holds (or just took) the cache-wide evictor lock."""
+        if fcntl is None:
+            return True
+        if self._evictor_fd is not None:
+            return True
+        try:
+            self.root.mkdir(parents=True, exist_ok=True)
+            fd = os.open(self.root / _EVICTOR_LOCK, os.O_CREAT | os.O_RDWR, 0o644)
+        except OSError:
+            return False
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        # Held for the life of the process; the kernel releases it if the process dies.
+        self._evictor_fd = fd
+        self._log(f"TTS_CACHE_EVICTOR pid={os.getpid()}")
+        return True
+
+    # -- lifecycle --------------------------------------------------------------
+
+    def start(self, legacy_dir: Path | None = None) -> None:
+        self.scan(legacy_dir)
+        self.sweep()
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="tts-cache-sweeper", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+        if self._evictor_fd is not None:
+            os.close(self._evictor_fd)
+            self._evictor_fd = None
+
+    def _run(self) -> None:
+        rounds = 0
+        while not self._stop.wait(self.sweep_interval_seconds):
+            rounds += 1
+            try:
+                if rounds % self.rescan_every == 0:
+                    self.scan()
+                self.sweep()
+            except Exception as e:
+                self._log(f"TTS_CACHE_SWEEP_FAIL | {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self._metrics)
+            out["files"] = len(self._index)
+            out["bytes"] = self._bytes
+            out["inflight"] = len(self._inflight)
+            out["pinned"] = len(self._pinned)
+            out["evictor"] = self._evictor_fd is not None or fcntl is None
+        looked = out["hits"] + out["misses"]
+        out["hit_ratio"] = round(out["hits"] / looked, 4) if looked else 0.0
+        return out
@@ -0,0 +1,274 @@
+"""Admission control for ElevenLabs synthesis requests.
+
+Live call turns, the pre-synthesis pass (session prewarm, phrase bank) and the
+dashboard (script preview, voice samples) all share one ElevenLabs
+concurrency quota. ``TTSScheduler`` hands out at most ``max_concurrency``
+slots and always grants the next free slot to the highest waiting class:
+
+* ``live``: a caller is on the line. Never shed for queue length; may use every slot.
+* ``prewarm``: background pre-synthesis. Queues behind live work and may not
+  take the last ``live_reserve`` slots.
+* ``preview``: dashboard requests. Same limits as prewarm, lowest priority,
+  and shed outright while live work is waiting or its queue is full.
+
+A waiter whose line becomes urgent (a live turn needs the sentence a prewarm
+job is still queued for) can be ``promote``-d by key. After a provider 429,
+``throttled`` pauses the non-live classes for a cool-down so the quota drains
+for calls. Queue depth, shed counts and wait-time percentiles per class are
+exposed through ``stats`` for ``/voice/provider``.
+
+Priorities are per process, but the quota is the account's. With ``slot_dir``
+set, ``slot`` also holds one of ``max_concurrency`` ``flock``-ed slot files
+there, so every worker process on the host shares the limit; non-live work may
+only take the files past the first ``live_reserve``, which keeps the reserve
+for calls in any worker. Without ``fcntl`` the limit is per process.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterator
+
+try:
+    import fcntl
+except Exception:  # not available on Windows; the quota is then per process only
+    fcntl = None
+
+LIVE = "live"
+PREWARM = "prewarm"
+PREVIEW = "preview"
+PRIORITIES = (LIVE, PREWARM, PREVIEW)
+
+
+class TTSBusy(Exception):
+    """The request was shed, or no slot freed up within its wait budget."""
+
+
+class _Waiter:
+    __slots__ = ("priority", "key", "granted", "enqueued")
+
+    def __init__(self, priority: str, key: str):
+        self.priority = priority
+        self.key = key
+        self.granted = False
+        self.enqueued = time.monotonic()
+
+
+class _ClassStats:
+    def __init__(self):
+        self.submitted = 0
+        self.granted = 0
+        self.shed = 0
+        self.timeouts = 0
+        self.promoted = 0
+        self.active = 0
+        self.waits_ms: deque[float] = deque(maxlen=256)
+
+    @staticmethod
+    def _pct(values, q: float) -> float:
+        if not values:
+            return 0.0
+        ordered = sorted(values)
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 1)
+
+    def snapshot(self, depth: int) -> dict:
+        return {
+            "submitted": self.submitted,
+            "granted": self.granted,
+            "shed": self.shed,
+            "timeouts": self.timeouts,
+            "promoted": self.promoted,
+            "active": self.active,
+            "queue_depth": depth,
+            "wait_ms_p50": self._pct(self.waits_ms, 0.5),
+            "wait_ms_p95": self._pct(self.waits_ms, 0.95),
+        }
+
+
+class TTSScheduler:
+    def __init__(
+        self,
+        max_concurrency: int = 4,
+        live_reserve: int = 1,
+        max_queue: dict[str, int] | None = None,
+        max_wait_seconds: dict[str, float] | None = None,
+        log: Callable[[str], None] | None = None,
+        slot_dir: str | Path | None = None,
+        shared_poll_seconds: float = 0.02,
+    ):
+        self.capacity = max(1, int(max_concurrency))
+        self.live_reserve = min(max(0, int(live_reserve)), self.capacity - 1)
+        self.max_queue = {PREWARM: 256, PREVIEW: 4, **(max_queue or {})}
+        self.max_wait_seconds = {LIVE: 10.0, PREWARM: 120.0, PREVIEW: 5.0, **(max_wait_seconds or {})}
+        self._log = log or (lambda _msg: None)
+        self._cond = threading.Condition()
+        self._queues: dict[str, deque[_Waiter]] = {p: deque() for p in PRIORITIES}
+        self._stats = {p: _ClassStats() for p in PRIORITIES}
+        self._active = 0
+        self._paused_until = 0.0
+        self._throttled = 0
+        self._shared_paths: list[Path] = []
+        self._shared_poll = max(0.001, float(shared_poll_seconds))
+        self._shared_waits = 0
+        if slot_dir is not None and fcntl is not None:
+            root = Path(slot_dir)
+            root.mkdir(parents=True, exist_ok=True)
+            self._shared_paths = [root / f"slot-{i}.lock" for i in range(self.capacity)]
+
+    # -- public -----------------------------------------------------------------
+
+    @contextmanager
+    def slot(self, priority: str, key: str = "") -> Iterator[str]:
+        """Hold one provider slot for the body; yields the class it was granted under.
+
+        With ``slot_dir`` set this also holds a slot shared with the other worker processes.
+        """
+        granted = self.acquire(priority, key)
+        try:
+            fd = self._claim_shared(granted)
+            try:
+                yield granted
+            finally:
+                if fd is not None:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                    os.close(fd)
+        finally:
+            self.release(granted)
+
+    def acquire(self, priority: str, key: str = "") -> str:
+        """Block until a slot is granted; returns the class it was granted under (promotion can change it)."""
+        if priority not in self._queues:
+            priority = PREWARM
+        with self._cond:
+            st = self._stats[priority]
+            st.submitted += 1
+            if priority != LIVE:
+                if len(self._queues[priority]) >= self.max_queue.get(priority, 0):
+                    st.shed += 1
+                    raise TTSBusy(f"{priority} queue full")
+                if priority == PREVIEW and self._queues[LIVE]:
+                    st.shed += 1
+                    raise TTSBusy("live synthesis waiting")
+            w = _Waiter(priority, key)
+            self._queues[priority].append(w)
+            self._dispatch_locked()
+            deadline = w.enqueued + self.max_wait_seconds.get(priority, 10.0)
+            while not w.granted:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    try:
+                        self._queues[w.priority].remove(w)
+                    except ValueError:
+                        pass
+                    self._stats[w.priority].timeouts += 1
+                    raise TTSBusy(f"no {w.priority} slot within {self.max_wait_seconds.get(priority, 10.0):g}s")
+                pause = self._paused_until - time.monotonic()
+                # Nobody releases a slot when a 429 cool-down ends, so wake for it ourselves.
+                self._cond.wait(min(remaining, pause + 0.001) if pause > 0 else remaining)
+                if not w.granted:
+                    self._dispatch_locked()
+            return w.priority
+
+    def release(self, priority: str) -> None:
+        with self._cond:
+            self._active -= 1
+            self._stats[priority].active -= 1
+            self._dispatch_locked()
+
+    def promote(self, key: str) -> bool:
+        """Move a queued waiter for ``key`` into the live class."""
+        if not key:
+            return False
+        with self._cond:
+            for p in (PREWARM, PREVIEW):
+                for w in self._queues[p]:
+                    if w.key == key:
+                        self._queues[p].remove(w)
+                        w.priority = LIVE
+                        self._queues[LIVE].append(w)
+                        self._stats[p].promoted += 1
+                        self._dispatch_locked()
+                        return True
+        return False
+
+    def throttled(self, cooldown_seconds: float = 5.0) -> None:
+        """Provider answered 429: keep non-live classes off the quota for a while."""
+        with self._cond:
+            self._throttled += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + max(0.0, cooldown_seconds))
+        self._log(f"TTS_SCHEDULER_THROTTLED cooldown_s={cooldown_seconds:.1f}")
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "max_concurrency": self.capacity,
+                "live_reserve": self.live_reserve,
+                "active": self._active,
+                "throttled": self._throttled,
+                "paused_ms": max(0, round((self._paused_until - time.monotonic()) * 1000)),
+                "cross_process": bool(self._shared_paths),
+                "shared_waits": self._shared_waits,
+                "classes": {p: self._stats[p].snapshot(len(self._queues[p])) for p in PRIORITIES},
+            }
+
+    # -- internals --------------------------------------------------------------
+
+    def _claim_shared(self, priority: str) -> int | None:
+        """Lock a free shared slot file (live may use the reserved ones); polls until the wait budget runs out."""
+        if not self._shared_paths:
+            return None
+        paths = self._shared_paths if priority == LIVE else self._shared_paths[self.live_reserve:]
+        wait = self.max_wait_seconds.get(priority, 10.0)
+        deadline = time.monotonic() + wait
+        waited = False
+        while True:
+            for path in paths:
+                fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    os.close(fd)
+                    continue
+                return fd
+            if not waited:
+                waited = True
+                with self._cond:
+                    self._shared_waits += 1
+            if time.monotonic() >= deadline:
+                with self._cond:
+                    self._stats[priority].timeouts += 1
+                raise TTSBusy(f"no shared {priority} slot within {wait:g}s")
+            time.sleep(self._shared_poll)
+
+    def _dispatch_locked(self) -> None:
+        granted = False
+        while self._active < self.capacity:
+            w = self._next_locked()
+            if w is None:
+                break
+            self._queues[w.priority].popleft()
+            w.granted = True
+            self._active += 1
+            st = self._stats[w.priority]
+            st.granted += 1
+            st.active += 1
+            st.waits_ms.append((time.monotonic() - w.enqueued) * 1000)
+            granted = True
+        if granted:
+            self._cond.notify_all()
+
+    def _next_locked(self) -> _Waiter | None:
+        if self._queues[LIVE]:
+            return self._queues[LIVE][0]
+        # Strict priority: nothing below live runs in the reserve or during a 429 cool-down.
+        if self._active >= self.capacity - self.live_reserve or time.monotonic() < self._paused_until:
+            return None
+        for p in (PREWARM, PREVIEW):
+            if self._queues[p]:
+                return self._queues[p][0]
+        return None
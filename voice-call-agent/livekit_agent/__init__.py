@@ -5,7 +5,7 @@ operate LiveKit and legacy in parallel with a safe fallback strategy.
 """
 
 from .config import LiveKitConfig
-from .health import check_livekit_health
+from .health import LiveKitHealthMonitor, check_livekit_health
 from .orchestrator import LiveKitVoiceOrchestrator
 
-__all__ = ["LiveKitConfig", "check_livekit_health", "LiveKitVoiceOrchestrator"]
+__all__ = ["LiveKitConfig", "LiveKitHealthMonitor", "check_livekit_health", "LiveKitVoiceOrchestrator"]
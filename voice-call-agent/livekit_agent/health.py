@@ -2,6 +2,10 @@
 
 from __future__ import annotations
 
+import threading
+import time
+from typing import Callable
+
 import requests
 
 from .config import LiveKitConfig
@@ -48,3 +52,95 @@ def check_livekit_health(timeout_seconds: int = 5) -> dict:
         "reason": "ready" if reachable else "unhealthy",
         "url": cfg.url,
     }
+
+
+class LiveKitHealthMonitor:
+    """Background prober that caches LiveKit readiness.
+
+    Request handlers call ``ready()``, which only reads the last cached result,
+    so a slow or unreachable LiveKit URL never adds latency to a call turn.
+    The prober re-checks every ``ttl_seconds`` while healthy and backs off
+    exponentially (up to ``max_backoff_seconds``) while unhealthy. A result
+    older than ``stale_after_seconds`` counts as not ready.
+    """
+
+    def __init__(
+        self,
+        check: Callable[..., dict] = check_livekit_health,
+        ttl_seconds: float = 15.0,
+        max_backoff_seconds: float = 120.0,
+        timeout_seconds: float = 3.0,
+        stale_after_seconds: float | None = None,
+        log: Callable[[str], None] | None = None,
+    ):
+        self._check = check
+        self.ttl_seconds = max(1.0, float(ttl_seconds))
+        self.max_backoff_seconds = max(self.ttl_seconds, float(max_backoff_seconds))
+        self.timeout_seconds = timeout_seconds
+        # Healthy results are refreshed every ttl; one that old plus slack means the prober has stalled.
+        self.stale_after_seconds = stale_after_seconds or (3 * self.ttl_seconds + float(timeout_seconds))
+        self._log = log or (lambda _msg: None)
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        # (ok, checked_at) is swapped as one tuple so ready() is a single read.
+        self._state: tuple[bool, float] = (False, 0.0)
+        self._last: dict = {"ok": False, "provider": "livekit", "reason": "not_probed"}
+        self._failures = 0
+        self._probes = 0
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="livekit-health", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+
+    def ready(self) -> bool:
+        ok, checked_at = self._state
+        return ok and (time.monotonic() - checked_at) < self.stale_after_seconds
+
+    def refresh(self) -> dict:
+        """Probe now on the calling thread and update the cache."""
+        try:
+            result = self._check(timeout_seconds=self.timeout_seconds) or {}
+        except Exception as exc:  # pragma: no cover - network dependent
+            result = {"ok": False, "provider": "livekit", "reason": "probe_error", "error": str(exc)}
+        ok = bool(result.get("ok"))
+        with self._lock:
+            was_ok = self._state[0]
+            self._state = (ok, time.monotonic())
+            self._last = result
+            self._probes += 1
+            self._failures = 0 if ok else self._failures + 1
+        if ok != was_ok:
+            self._log(f"LIVEKIT_HEALTH {'READY' if ok else 'NOT_READY'} | {result.get('reason', '')}")
+        return result
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            ok, checked_at = self._state
+            return {
+                **self._last,
+                "ready": self.ready(),
+                "age_seconds": round(time.monotonic() - checked_at, 1) if checked_at else None,
+                "consecutive_failures": self._failures,
+                "probes": self._probes,
+                "next_probe_in_seconds": round(self._interval(), 1),
+            }
+
+    def _interval(self) -> float:
+        if not self._failures:
+            return self.ttl_seconds
+        return min(self.max_backoff_seconds, self.ttl_seconds * (2 ** min(self._failures - 1, 16)))
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.refresh()
+            self._wake.wait(self._interval())
+            self._wake.clear()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""Labeled corpus for the local intent classifier (app/intents.py).
+
+    python tests/intent_corpus.py [-v]
+
+Each entry is (caller utterance, expected label). ``unknown`` means the turn
+should fall through to the normal flow / LLM. The old substring checks got
+several of these wrong ("know" read as "no", "stop the rollout" ending the
+call); they are kept here as regressions.
+"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.intents import DEFAULT_THRESHOLD, classify  # noqa: E402
+
+CORPUS = [
+    # consent / confirmation: yes
+    ("yes", "yes"),
+    ("Yes.", "yes"),
+    ("yeah sure", "yes"),
+    ("Yep, go ahead.", "yes"),
+    ("okay", "yes"),
+    ("Sure, I have a few minutes.", "yes"),
+    ("Yes this is a good time", "yes"),
+    ("Absolutely, let's do it.", "yes"),
+    ("That's right", "yes"),
+    ("correct", "yes"),
+    ("No problem, go ahead.", "yes"),
+    ("uh huh", "yes"),
+    ("Of course", "yes"),
+    ("yeah I can talk now", "yes"),
+    ("I do", "yes"),
+    ("1", "yes"),
+    # consent / confirmation: no
+    ("no", "no"),
+    ("No thanks.", "no"),
+    ("Nope", "no"),
+    ("not now", "no"),
+    ("Not right now, I'm busy.", "no"),
+    ("I'm busy, call me back later.", "no"),
+    ("No, this is not a good time.", "no"),
+    ("That's all.", "no"),
+    ("no more questions", "no"),
+    ("None, thank you.", "no"),
+    ("Wrong number", "no"),
+    ("Nah I'm good", "no"),
+    ("I do not", "no"),
+    ("I do not.", "no"),
+    ("I don't", "no"),
+    ("That's it", "no"),
+    ("Nothing, thanks", "no"),
+    ("Not interested", "no"),
+    ("Not at this time", "no"),
+    ("I'm not interested in the role.", "no"),
+    ("2", "no"),
+    # end of call
+    ("Can we end the call?", "end_call"),
+    ("please hang up", "end_call"),
+    ("Goodbye.", "end_call"),
+    ("ok bye", "end_call"),
+    ("stop", "end_call"),
+    ("I have to go now, sorry.", "end_call"),
+    ("Please stop calling me.", "end_call"),
+    # questions
+    ("What is the salary range?", "question"),
+    ("Is this role remote", "question"),
+    ("How big is the team", "question"),
+    ("Yes, what does the on-call rotation look like?", "question"),
+    ("No, I have a question about the benefits.", "question"),
+    ("Can you tell me more about the company", "question"),
+    ("I wanted to ask about the start date.", "question"),
+    ("Who would I report to?", "question"),
+    ("Has the position been filled?", "question"),
+    ("Did you get my resume?", "question"),
+    # voicemail greetings
+    ("Hi, you've reached John. Please leave a message after the tone.", "voicemail"),
+    ("The person you are calling is not available.", "voicemail"),
+    ("I can't take your call right now, leave your name and number.", "voicemail"),
+    ("Your call has been forwarded to an automated voice messaging system. At the tone, please record your message.", "voicemail"),
+    ("This mailbox is full.", "voicemail"),
+    ("Sorry I'm not available, I'll get back to you. Beep.", "voicemail"),
+    # open answers that must not trigger a control intent
+    ("I know Kubernetes and Terraform pretty well.", "unknown"),
+    ("We had to stop the rollout after the canary failed and then rebuilt the pipeline.", "unknown"),
+    ("I led a team of five engineers on a migration to AWS.", "unknown"),
+    ("Mostly Python, some Go, and a lot of SQL.", "unknown"),
+    ("I'm not sure", "unknown"),
+    ("I don't know", "unknown"),
+    ("Let me think about that for a second", "unknown"),
+    ("Right now I work at a fintech startup building payment APIs.", "unknown"),
+    ("Notably, the service handled ten thousand requests per second.", "unknown"),
+    ("I noticed the latency regression in our nightly benchmarks.", "unknown"),
+    ("Have been working as a data engineer for five years", "unknown"),
+    ("Was mostly backend work on the billing team", "unknown"),
+    ("Did a lot of Spark tuning at my last job", "unknown"),
+    ("Nothing beats Python for data pipelines in my experience.", "unknown"),
+    ("", "unknown"),
+    ("   ", "unknown"),
+    ("5", "unknown"),
+]
+
+
+def ok(cond, msg):
+    if not cond:
+        raise AssertionError(msg)
+
+
+def main():
+    verbose = "-v" in sys.argv[1:]
+    misses = []
+    for text, expected in CORPUS:
+        intent = classify(text)
+        got = intent.label if intent.confidence >= DEFAULT_THRESHOLD else "unknown"
+        if verbose or got != expected:
+            print(f"{'ok  ' if got == expected else 'MISS'} {expected:>9} <- {got:<9} {intent.confidence:.2f} {text!r}")
+        if got != expected:
+            misses.append(text)
+    ok(not misses, f"{len(misses)} of {len(CORPUS)} utterances misclassified")
+
+    n = 20000
+    started = time.perf_counter()
+    for i in range(n):
+        classify(CORPUS[i % len(CORPUS)][0])
+    per_call_us = (time.perf_counter() - started) / n * 1e6
+    ok(per_call_us < 500, f"classify too slow: {per_call_us:.1f}us per call")
+
+    print(f"INTENT_CORPUS_OK ({len(CORPUS)} utterances, {per_call_us:.1f}us per classify)")
+
+
+if __name__ == "__main__":
+    main()